@@ -1,8 +1,10 @@
 import uvicorn
 import os
+import queue
+import atexit
 import logging
 import platform
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from services.sentences_service import SentencesService
@@ -30,14 +32,19 @@ from services.llm_service import LLMService
 from services.phoneme_service import PhonemeService
 from services.pronunciation_assessment import PronunciationAssessmentService
 
-# --- Cấu hình logging (không đổi) ---
+# --- Cấu hình logging ---
+# Request threads chỉ đẩy record vào queue; ghi file chạy trên thread nền của QueueListener
 log_file = "app.log"
 logger = logging.getLogger("api_logger")
 logger.setLevel(logging.INFO)
 file_handler = RotatingFileHandler(log_file, maxBytes=10485760, backupCount=5, encoding="utf-8")
 formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(log_queue))
+log_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 logger.info("--- Ứng dụng FastAPI bắt đầu khởi động ---")
 
 # --- Cấu hình eSpeak (không đổi) ---
@@ -74,7 +81,7 @@ async def startup_event():
     logger.info("Bắt đầu quá trình warmup...")
     try:
         whisper_service.warmup()
-        pronunciation_service.warmup()
+        pronunciation_service.warmup([row["sentence"] for row in sentences_service.load_sentences()])
         pronunciation_assessment_service.warmup()
         logger.info("Warmup thành công.")
     except Exception as e:
@@ -3,8 +3,9 @@ import io
 import numpy as np
 import soundfile as sf
 import librosa
+import soxr
+import logging
 import traceback
-import tempfile
 import os
 import subprocess
 from typing import Optional, List, Tuple
@@ -14,6 +15,8 @@ from transformers import pipeline, Wav2Vec2Processor
 from gtts import gTTS
 from difflib import SequenceMatcher
 
+logger = logging.getLogger(__name__)
+
 class PhonemeService:
     """
     Dịch vụ chuyển đổi giọng nói thành chuỗi phiên âm (phoneme)
@@ -50,22 +53,31 @@ class PhonemeService:
         """
         try:
             audio_bytes = base64.b64decode(audio_base64)
-            audio_file = io.BytesIO(audio_bytes)
-            
-            audio_segment = AudioSegment.from_file(audio_file)
             
-            audio_segment = audio_segment.set_frame_rate(16000)
-            audio_segment = audio_segment.set_channels(1) # 1 = Mono
-            
-            wav_io = io.BytesIO()
-            audio_segment.export(wav_io, format="wav")
-            wav_io.seek(0)
+            try:
+                # WAV/FLAC/OGG: đọc thẳng từ bytes, không qua ffmpeg
+                audio_data, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype='float32')
+                if audio_data.ndim > 1:
+                    audio_data = audio_data.mean(axis=1, dtype=np.float32)
+                if sample_rate != 16000:
+                    audio_data = soxr.resample(audio_data, sample_rate, 16000, quality='HQ')
+                    sample_rate = 16000
+            except Exception:
+                audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
+                
+                audio_segment = audio_segment.set_frame_rate(16000)
+                audio_segment = audio_segment.set_channels(1) # 1 = Mono
+                
+                wav_io = io.BytesIO()
+                audio_segment.export(wav_io, format="wav")
+                wav_io.seek(0)
 
-            audio_data, sample_rate = librosa.load(wav_io, sr=None) 
-            audio_data = np.array(audio_data, dtype=np.float32)
-            max_abs_val = np.max(np.abs(audio_data))
-            if max_abs_val > 0:
-                audio_data /= max_abs_val
+                audio_data, sample_rate = librosa.load(wav_io, sr=None) 
+            audio_data = np.asarray(audio_data, dtype=np.float32)
+            if audio_data.size:
+                max_abs_val = max(float(audio_data.max()), -float(audio_data.min()))
+                if max_abs_val > 0:
+                    np.multiply(audio_data, 1.0 / max_abs_val, out=audio_data)
             
             return audio_data, sample_rate
             
@@ -131,7 +143,6 @@ class PhonemeService:
             ref_phonemes = reference_phonemes.split()
             learner_phonemes_list = learner_phonemes.split()
             
-            matcher = SequenceMatcher(None, ref_phonemes, learner_phonemes_list, autojunk=False)
             comparisons = []
             correct_count = 0
             total_count = len(ref_phonemes)
@@ -147,6 +158,9 @@ class PhonemeService:
                     })
                 return comparisons, 0.0, 0, 0
 
+            # Giữ difflib: matching blocks quyết định correct_count (điểm số); edit script
+            # Levenshtein tối thiểu có thể chọn replace thay cho equal khi hòa chi phí
+            matcher = SequenceMatcher(None, ref_phonemes, learner_phonemes_list, autojunk=False)
             for tag, i1, i2, j1, j2 in matcher.get_opcodes():
                 if tag == 'equal':
                     for k in range(i2 - i1):
@@ -246,8 +260,8 @@ class PhonemeService:
             if not learner_phonemes:
                 return {"error": "Không thể chuyển đổi audio thành phonemes"}
             
-            print(f"Reference phonemes: '{reference_phonemes}'")
-            print(f"Learner phonemes: '{learner_phonemes}'")
+            logger.debug("Reference phonemes: '%s'", reference_phonemes)
+            logger.debug("Learner phonemes: '%s'", learner_phonemes)
             
             # Bước 3: So sánh phoneme
             comparisons, score, correct, total = self.compare_phonemes(
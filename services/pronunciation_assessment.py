@@ -6,33 +6,60 @@ This avoids cutting issues when words are spoken continuously
 """
 
 import os
+import re
 import json
 import nltk
 import torch
 import numpy as np
-import librosa
-import resampy
+import soxr
 import whisperx
+import ctranslate2
+import io
 import base64
-import tempfile
+import binascii
 import logging
+import threading
+import statistics
+import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import lru_cache
+from types import SimpleNamespace
+from pydub import AudioSegment
 from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
-from Levenshtein import distance as levenshtein_distance
 from g2p_en import G2p
 from typing import Dict, List, Any
 from models import PronunciationScore, WordError
 from services.llm_service import LLMService
 
+try:
+    from rapidfuzz.distance import Levenshtein
+except ImportError:  # pure-Python DP fallback in align_phoneme_sequences
+    Levenshtein = None
+
+try:
+    import orjson
+except ImportError:  # stdlib json in main()
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:  # NumPy row DP in _align_phoneme_sequences_dp
+    njit = None
+
 # Download required NLTK data
 nltk.download('cmudict', quiet=True)
 arpabet = nltk.corpus.cmudict.dict()
 
+module_logger = logging.getLogger(__name__)
+
 class PronunciationAssessmentService:
     """Service wrapper for pronunciation assessment"""
     
     def __init__(self, phoneme_service=None, llm_service=None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.compute_type = "float32" if self.device == "cuda" else "int8"
+        self.compute_type = select_compute_type(self.device)
         self.target_sr = 16000
         self.processor = None
         self.model = None
@@ -44,100 +71,155 @@ class PronunciationAssessmentService:
         self.llm_service = llm_service if llm_service else LLMService()
         
         self.logger = logging.getLogger(__name__)
-        
-    def warmup(self):
-        """Initialize and warmup the models"""
-        try:
-            print("🔧 Warming up Pronunciation Assessment Service...")
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pa-g2p")
+        # Wave2Phoneme gets its own CUDA stream so it can overlap WhisperX / alignment kernels
+        self._phoneme_stream = torch.cuda.Stream() if self.device == "cuda" else None
+        
+    def _ensure_model_loaded(self):
+        """Load Wav2Vec2 model once (thread-safe), reusing PhonemeService's model if available"""
+        if self.processor is not None and self.model is not None:
+            return
+        
+        with self._model_lock:
+            if self.processor is not None and self.model is not None:
+                return
             
             if self.phoneme_service:
-                print("  ✓ Reusing Wav2Vec2 model from PhonemeService (no reload needed)")
-                self.processor, self.model = self.phoneme_service.get_processor_and_model()
+                self.logger.debug("  ✓ Reusing Wav2Vec2 model from PhonemeService (no reload needed)")
+                processor, model = self.phoneme_service.get_processor_and_model()
             else:
-                print("  ⚠️  PhonemeService not provided, loading Wav2Vec2 model separately")
-                self.processor, self.model = load_wave2phoneme_model()
+                self.logger.warning("  ⚠️  PhonemeService not provided, loading Wav2Vec2 model separately")
+                processor, model = load_wave2phoneme_model()
             
-            print("  🎤 Loading WhisperX model...")
-            self.whisper_model = whisperx.load_model("small.en", self.device, compute_type=self.compute_type)
-            print("  ✓ WhisperX model loaded")
+            # Compile / export once here so requests never pay the JIT cost
+            if model is not None:
+                model = optimize_wave2phoneme_model(model)
+            self.processor, self.model = processor, model
+        
+        if self.processor is None or self.model is None:
+            raise RuntimeError("Wave2Phoneme model could not be loaded")
+        
+    def _load_whisper(self):
+        """Load WhisperX ASR model, falling back to float32 if float16 is not available"""
+        self.logger.debug("  🎤 Loading WhisperX model %s (%s)...", WHISPER_MODEL_NAME, self.compute_type)
+        try:
+            self.whisper_model = load_whisper_model(self.device, self.compute_type)
+        except Exception as e:
+            if self.compute_type != "float16":
+                raise
+            self.logger.warning("  ⚠️  float16 not available (%s), falling back to float32", e)
+            self.compute_type = "float32"
+            self.whisper_model = load_whisper_model(self.device, self.compute_type)
+        self.logger.debug("  ✓ WhisperX model loaded")
+
+    def _load_align(self):
+        if WHISPER_BACKEND == "faster-whisper":
+            return
+        self.logger.debug("  🎯 Loading WhisperX alignment model...")
+        self.align_model, self.align_metadata = load_align_model("en", self.device)
+        self.logger.debug("  ✓ WhisperX alignment model loaded")
+
+    def _load_g2p(self):
+        self.logger.debug("  📚 Loading G2P model...")
+        self.g2p = get_g2p()
+        self.logger.debug("  ✓ G2P model loaded")
+
+    def warmup(self):
+        """Initialize and warmup the models (loads run in parallel, then one dummy forward each)"""
+        try:
+            self.logger.debug("🔧 Warming up Pronunciation Assessment Service...")
             
-            print("  🎯 Loading WhisperX alignment model...")
-            self.align_model, self.align_metadata = whisperx.load_align_model(
-                language_code="en", 
-                device=self.device
-            )
-            print("  ✓ WhisperX alignment model loaded")
+            # Các model độc lập nhau (disk read + CUDA upload) - load song song
+            with ThreadPoolExecutor(max_workers=4, thread_name_prefix="pa-warmup") as ex:
+                futures = [
+                    ex.submit(self._load_whisper),
+                    ex.submit(self._load_align),
+                    ex.submit(self._load_g2p),
+                    ex.submit(self._ensure_model_loaded),
+                ]
+                for future in futures:
+                    future.result()
             
-            print("  📚 Loading G2P model...")
-            self.g2p = G2p()
-            print("  ✓ G2P model loaded")
+            # Dummy forward on 1s of silence so the first request doesn't pay kernel autotune
+            silence = np.zeros(self.target_sr, dtype=np.float32)
+            try:
+                get_word_timestamps(
+                    silence, self.target_sr,
+                    whisper_model=self.whisper_model,
+                    align_model=self.align_model,
+                    align_metadata=self.align_metadata,
+                    device=self.device
+                )
+                predict_phonemes_full_audio(silence, self.target_sr, self.processor, self.model, device=self.device)
+            except Exception as e:
+                self.logger.warning("  ⚠️  Warmup forward failed: %s", e)
+            if self.device == "cuda":
+                torch.cuda.synchronize()
+                torch.cuda.empty_cache()
             
-            print("✅ Pronunciation Assessment Service warmed up successfully")
+            self.logger.debug("✅ Pronunciation Assessment Service warmed up successfully")
         except Exception as e:
-            self.logger.error(f"❌ Failed to warmup Pronunciation Assessment Service: {e}")
+            self.logger.error("❌ Failed to warmup Pronunciation Assessment Service: %s", e)
 
     def evaluate_pronunciation_assessment(self, audio_base64: str, reference_text: str) -> Dict[str, Any]:
         """
         Main API function to evaluate pronunciation using the assessment method
         """
         try:
-            print(f"🎯 Evaluating pronunciation for: '{reference_text}'")
+            self.logger.debug("🎯 Evaluating pronunciation for: '%s'", reference_text)
+            
+            # STEP 3 (G2P, pure CPU) runs in the background while STEP 1-2 decode and transcribe
+            ref_future = self._executor.submit(get_reference_phonemes, reference_text, self.g2p)
             
             # STEP 1: Decode and preprocess audio
             audio_data, sr = self._preprocess_audio_from_base64(audio_base64)
             
-            # Create temporary file for processing
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-                import soundfile as sf
-                sf.write(tmp_file.name, audio_data, sr)
-                temp_audio_path = tmp_file.name
-            
-            try:
-                # STEP 2: WhisperX timestamps 
-                words_with_times = get_word_timestamps(
-                    temp_audio_path, 
-                    self.whisper_model, 
-                    self.align_model, 
-                    self.align_metadata,
-                    self.device
+            # Wave2Phoneme on the full audio doesn't need WhisperX output - overlap the two
+            phoneme_future = None
+            if WAV2VEC2_SKIP_CONFIDENCE > 1:
+                self._ensure_model_loaded()
+                phoneme_future = self._executor.submit(
+                    predict_phonemes_full_audio,
+                    audio_data, sr, self.processor, self.model, self.device, self._phoneme_stream
                 )
-                
-                # STEP 3: Reference phonemes
-                reference_phonemes = get_reference_phonemes(reference_text, self.g2p)
-                
-                # STEP 4: Load Wave2Phoneme model if not loaded 
-                if self.processor is None or self.model is None:
-                    print(f"STEP 4: Load Wave2Phoneme model if not loaded ")
-                    self.processor, self.model = load_wave2phoneme_model()
-                
-                # STEP 5: Predict phonemes from FULL audio
-                predicted_phonemes_full = predict_phonemes_full_audio(
-                    audio_data, sr, self.processor, self.model, self.device
-                )
-                
-                # STEP 6: Align phonemes to words
-                word_predicted_phonemes, word_alignments = align_phonemes_to_words_v2(
-                    predicted_phonemes_full, 
-                    reference_phonemes,
-                    words_with_times
-                )
-                
-                # STEP 7-8: Score each word and build result
-                result = self._build_comprehensive_result(
-                    reference_text, words_with_times, word_predicted_phonemes, 
-                    word_alignments, reference_phonemes
-                )
-                
-                print(f"✅ Assessment completed. Overall: {result['scores']['overall']:.1f} | Pronunciation: {result['scores']['pronunciation']:.1f} | Fluency: {result['scores']['fluency']:.1f}")
-                return result
-                
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_audio_path):
-                    os.unlink(temp_audio_path)
+            
+            # STEP 2: WhisperX timestamps 
+            words_with_times = get_word_timestamps(
+                audio_data, 
+                sr,
+                whisper_model=self.whisper_model, 
+                align_model=self.align_model, 
+                align_metadata=self.align_metadata,
+                device=self.device
+            )
+            
+            # Normalize words once (word_clean, start, end, confidence columns)
+            words = _normalize_words(words_with_times)
+            
+            # STEP 3: Reference phonemes
+            reference_phonemes = ref_future.result()
+            
+            # STEP 4-6: Wave2Phoneme on the low-confidence span + align phonemes to words
+            word_predicted_phonemes, word_alignments, skipped_words = self._predict_word_phonemes(
+                audio_data, sr, words_with_times, words, reference_phonemes, phoneme_future
+            )
+            
+            # STEP 7-8: Score each word and build result
+            result = self._build_comprehensive_result(
+                reference_text, words_with_times, word_predicted_phonemes, 
+                word_alignments, reference_phonemes, words, skipped_words
+            )
+            
+            scores = result['scores']
+            self.logger.debug(
+                "✅ Assessment completed. Overall: %.1f | Pronunciation: %.1f | Fluency: %.1f",
+                scores['overall'], scores['pronunciation'], scores['fluency']
+            )
+            return result
                     
         except Exception as e:
-            self.logger.error(f"❌ Error in pronunciation assessment: {e}")
+            self.logger.error("❌ Error in pronunciation assessment: %s", e)
             return {
                 'error': str(e),
                 'scores': {'sentence_score': 0.0, 'grade': 'Error', 'overall': 0.0, 'pronunciation': 0.0, 'fluency': 0.0, 'intonation': 0.0, 'stress': 0.0},
@@ -147,49 +229,114 @@ class PronunciationAssessmentService:
                 'feedback': 'Có lỗi xảy ra trong quá trình đánh giá phát âm.'
             }
 
+    def _predict_word_phonemes(self, audio_data, sr, words_with_times, words, reference_phonemes, phoneme_future=None):
+        """
+        Run Wave2Phoneme only where WhisperX is unsure
+        Words with confidence >= WAV2VEC2_SKIP_CONFIDENCE are taken as matching their reference
+        phonemes; the model runs on the audio span covering the remaining words.
+        phoneme_future: full-audio prediction already started alongside WhisperX
+        Returns (word_predicted_phonemes, word_alignments, skipped_words)
+        """
+        if phoneme_future is not None:
+            aligned = align_phonemes_to_words_v2(phoneme_future.result(), reference_phonemes, words_with_times, words)
+            return (*aligned, set()) if aligned else ({}, {}, set())
+        
+        suspicious = words.confidence < WAV2VEC2_SKIP_CONFIDENCE
+        
+        # Từ tin cậy cao: predicted = reference (phoneme_accuracy vẫn lấy theo confidence)
+        word_predicted_phonemes = {}
+        word_alignments = {}
+        for word_clean in words.clean:
+            ref_phonemes = reference_phonemes.get(word_clean, [])
+            if ref_phonemes:
+                word_predicted_phonemes[word_clean] = list(ref_phonemes)
+                word_alignments[word_clean] = [(p, p, True) for p in ref_phonemes]
+        skipped_words = set(word_alignments)
+        
+        if not suspicious.any():
+            self.logger.debug("  ✓ All words above confidence threshold, skipping Wave2Phoneme")
+            return word_predicted_phonemes, word_alignments, skipped_words
+        
+        # STEP 4: Load Wave2Phoneme model if not loaded 
+        self._ensure_model_loaded()
+        
+        # Span of the suspicious words (plus a little context); words overlapping it are re-aligned
+        span_start = max(0.0, float(words.start[suspicious].min()) - WAV2VEC2_SPAN_PADDING)
+        span_end = float(words.end[suspicious].max()) + WAV2VEC2_SPAN_PADDING
+        in_span = np.flatnonzero((words.end > span_start) & (words.start < span_end))
+        
+        # STEP 5: Predict phonemes for the span only
+        span_audio = audio_data[int(span_start * sr):int(span_end * sr)]
+        self.logger.debug("  ✓ Wave2Phoneme on %.2fs - %.2fs (%d/%d words)", span_start, span_end, len(in_span), len(words.clean))
+        predicted_phonemes = predict_phonemes_full_audio(
+            span_audio, sr, self.processor, self.model, self.device, self._phoneme_stream
+        )
+        
+        # STEP 6: Align phonemes to the words inside the span
+        span_words = WordsSoA(
+            clean=[words.clean[i] for i in in_span.tolist()],
+            start=words.start[in_span],
+            end=words.end[in_span],
+            confidence=words.confidence[in_span],
+        )
+        aligned = align_phonemes_to_words_v2(
+            predicted_phonemes,
+            reference_phonemes,
+            [words_with_times[i] for i in in_span.tolist()],
+            span_words
+        )
+        for word_clean in span_words.clean:
+            word_predicted_phonemes.pop(word_clean, None)
+            word_alignments.pop(word_clean, None)
+            skipped_words.discard(word_clean)
+        if aligned:
+            word_predicted_phonemes.update(aligned[0])
+            word_alignments.update(aligned[1])
+        
+        return word_predicted_phonemes, word_alignments, skipped_words
+
     def _preprocess_audio_from_base64(self, audio_base64: str):
         """Decode base64 audio and preprocess"""
-        print("🔧 STEP 1: Preprocessing audio from base64...")
+        self.logger.debug("🔧 STEP 1: Preprocessing audio from base64...")
         
         try:
-            # Decode base64
-            audio_bytes = base64.b64decode(audio_base64)
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-                tmp_file.write(audio_bytes)
-                temp_path = tmp_file.name
+            # Decode base64 in blocks, straight into one buffer
+            audio_bytes = _b64_to_bytes(audio_base64)
             
+            # Load audio in memory (WAV via soundfile, other containers via pydub)
             try:
-                # Load audio using existing function logic
-                audio_data, sr = librosa.load(temp_path, sr=None)
-                print(f"  ✓ Loaded: {len(audio_data)} samples @ {sr} Hz")
-                
-                # Resample if needed
-                if sr != self.target_sr:
-                    audio_data = resampy.resample(audio_data, sr, self.target_sr)
-                    sr = self.target_sr
-                    print(f"  ✓ Resampled to {self.target_sr} Hz")
-                
-                # Normalize
-                if len(audio_data) > 0:
-                    max_val = np.abs(audio_data).max()
-                    if max_val > 0:
-                        audio_data = audio_data / max_val * 0.95
-                    print("  ✓ Normalized")
-                
-                return audio_data, sr
-                    
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
+                audio_data, sr = sf.read(io.BytesIO(audio_bytes), dtype='float32')
+            except Exception:
+                audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
+                wav_buffer = io.BytesIO()
+                audio_segment.export(wav_buffer, format="wav")
+                wav_buffer.seek(0)
+                audio_data, sr = sf.read(wav_buffer, dtype='float32')
+            
+            if audio_data.ndim > 1:
+                audio_data = audio_data.mean(axis=1, dtype=np.float32)
+            self.logger.debug("  ✓ Loaded: %d samples @ %d Hz", len(audio_data), sr)
+            
+            # Resample if needed
+            if sr != self.target_sr:
+                audio_data = soxr.resample(audio_data, sr, self.target_sr, quality='HQ')
+                sr = self.target_sr
+                self.logger.debug("  ✓ Resampled to %d Hz", self.target_sr)
+            
+            # Normalize in place (peak from max/min, no abs() temporary)
+            if len(audio_data) > 0:
+                peak = max(float(audio_data.max()), -float(audio_data.min()))
+                if peak > 0:
+                    np.multiply(audio_data, 0.95 / peak, out=audio_data)
+                self.logger.debug("  ✓ Normalized")
+            
+            return audio_data, sr
                     
         except Exception as e:
-            self.logger.error(f"  ❌ Error preprocessing audio: {e}")
+            self.logger.error("  ❌ Error preprocessing audio: %s", e)
             raise
 
-    def _calculate_fluency_score(self, words_with_times):
+    def _calculate_fluency_score(self, words_with_times, words=None):
         """
         Calculate fluency score based on word timestamps
         
@@ -204,9 +351,16 @@ class PronunciationAssessmentService:
         
         word_count = len(words_with_times)
         
+        # Timestamp / word-length columns, all metrics below are vector ops on these
+        if words is None:
+            words = _normalize_words(words_with_times)
+        starts = words.start
+        ends = words.end
+        word_lens = np.fromiter((len(w['word']) for w in words_with_times), dtype=np.int64, count=word_count)
+        
         # ========== 1. SPEECH RATE (Tốc độ nói) ==========
         # Speech rate = Số từ / Tổng thời gian phát âm
-        total_duration = words_with_times[-1]['end'] - words_with_times[0]['start']
+        total_duration = float(ends[-1] - starts[0])
         speech_rate = word_count / total_duration if total_duration > 0 else 0  # words per second
         speech_rate_wpm = speech_rate * 60  # words per minute
         
@@ -227,32 +381,18 @@ class PronunciationAssessmentService:
         
         # ========== 2. PAUSES (Khoảng dừng) ==========
         # Phân tích khoảng cách giữa thời điểm kết thúc từ này và bắt đầu từ kế tiếp
-        pauses = []
+        gaps = starts[1:] - ends[:-1]
+        pauses = gaps[gaps > 0]
+        
+        # Phân loại pause: natural (<=0.3s), acceptable (<=0.6s), long (<=1.0s), very_long (>1.0s)
+        pause_bins = np.bincount(np.searchsorted([0.3, 0.6, 1.0], pauses, side='left'), minlength=4)
         pause_categories = {
-            'natural': 0,      # 0.05-0.3s: Tự nhiên
-            'acceptable': 0,   # 0.3-0.6s: Chấp nhận được
-            'long': 0,         # 0.6-1.0s: Dài
-            'very_long': 0     # >1.0s: Rất dài
+            'natural': int(pause_bins[0]),      # 0.05-0.3s: Tự nhiên
+            'acceptable': int(pause_bins[1]),   # 0.3-0.6s: Chấp nhận được
+            'long': int(pause_bins[2]),         # 0.6-1.0s: Dài
+            'very_long': int(pause_bins[3])     # >1.0s: Rất dài
         }
         
-        for i in range(len(words_with_times) - 1):
-            current_end = words_with_times[i]['end']
-            next_start = words_with_times[i + 1]['start']
-            pause = next_start - current_end
-            
-            if pause > 0:
-                pauses.append(pause)
-                
-                # Phân loại pause
-                if pause <= 0.3:
-                    pause_categories['natural'] += 1
-                elif pause <= 0.6:
-                    pause_categories['acceptable'] += 1
-                elif pause <= 1.0:
-                    pause_categories['long'] += 1
-                else:
-                    pause_categories['very_long'] += 1
-        
         # Tính điểm pause (0-100)
         total_pauses = len(pauses)
         if total_pauses > 0:
@@ -267,9 +407,9 @@ class PronunciationAssessmentService:
         else:
             pause_score = 100.0
         
-        avg_pause = np.mean(pauses) if pauses else 0
-        max_pause = max(pauses) if pauses else 0
-        total_pause_time = sum(pauses) if pauses else 0
+        avg_pause = float(pauses.mean()) if total_pauses else 0
+        max_pause = float(pauses.max()) if total_pauses else 0
+        total_pause_time = float(pauses.sum()) if total_pauses else 0
         
         # ========== 3. CONTINUITY (Sự liền mạch) ==========
         # Đo lường mức độ từ ngữ được phát âm liên tục, không bị ngắt quãng
@@ -296,28 +436,16 @@ class PronunciationAssessmentService:
         # So sánh duration từng từ với thời gian tham chiếu (chuẩn)
         # Ước lượng: ~0.3-0.5s cho từ ngắn, ~0.5-0.8s cho từ dài
         
-        word_durations = []
-        timing_deviations = []
+        word_durations = ends - starts
         
-        for word_info in words_with_times:
-            duration = word_info['end'] - word_info['start']
-            word_durations.append(duration)
-            
-            # Ước lượng duration chuẩn dựa trên số ký tự
-            word_len = len(word_info['word'])
-            if word_len <= 3:
-                expected_duration = 0.35  # Từ ngắn
-            elif word_len <= 6:
-                expected_duration = 0.50  # Từ trung bình
-            else:
-                expected_duration = 0.70  # Từ dài
-            
-            # Tính độ lệch
-            deviation = abs(duration - expected_duration) / expected_duration
-            timing_deviations.append(deviation)
+        # Ước lượng duration chuẩn dựa trên số ký tự: ngắn 0.35s, trung bình 0.50s, dài 0.70s
+        expected_durations = np.where(word_lens <= 3, 0.35, np.where(word_lens <= 6, 0.50, 0.70))
+        
+        # Tính độ lệch
+        timing_deviations = np.abs(word_durations - expected_durations) / expected_durations
         
         # Điểm timing accuracy (0-100)
-        avg_deviation = np.mean(timing_deviations) if timing_deviations else 0
+        avg_deviation = float(timing_deviations.mean())
         
         # Deviation < 30% = tốt, 30-50% = chấp nhận được, >50% = kém
         if avg_deviation < 0.3:
@@ -363,7 +491,7 @@ class PronunciationAssessmentService:
             'continuity_score': round(continuity_score, 1),
             
             # Timing accuracy
-            'avg_word_duration': round(np.mean(word_durations), 3) if word_durations else 0,
+            'avg_word_duration': round(float(word_durations.mean()), 3),
             'avg_timing_deviation': round(avg_deviation, 3),
             'timing_score': round(timing_score, 1),
             
@@ -373,78 +501,75 @@ class PronunciationAssessmentService:
         
         return fluency_score, fluency_details
 
-    def _calculate_word_fluency_score(self, word_info, word_len):
+    def _word_fluency_vec(self, durations, word_lens):
         """
-        Calculate fluency score for individual word based on duration
+        Calculate fluency score for every word at once based on duration
         Expected duration: ~0.35s for short words, ~0.5s for medium, ~0.7s for long
         """
-        duration = word_info['end'] - word_info['start']
+        durations = np.asarray(durations, dtype=np.float64)
+        word_lens = np.asarray(word_lens)
         
         # Ước lượng duration chuẩn
-        if word_len <= 3:
-            expected_duration = 0.35
-        elif word_len <= 6:
-            expected_duration = 0.50
-        else:
-            expected_duration = 0.70
+        expected = np.where(word_lens <= 3, 0.35, np.where(word_lens <= 6, 0.50, 0.70))
         
         # Tính độ lệch
-        deviation = abs(duration - expected_duration) / expected_duration
+        deviation = np.abs(durations - expected) / expected
         
         # Điểm fluency cho từ (0-100)
-        if deviation < 0.3:
-            return 100.0
-        elif deviation < 0.5:
-            return 100.0 - (deviation - 0.3) * 150  # 70-100
-        else:
-            return max(50.0, 70.0 - (deviation - 0.5) * 50)
+        return np.where(
+            deviation < 0.3, 100.0,
+            np.where(
+                deviation < 0.5,
+                100.0 - (deviation - 0.3) * 150,  # 70-100
+                np.maximum(50.0, 70.0 - (deviation - 0.5) * 50),
+            ),
+        )
 
-    def _build_comprehensive_result(self, reference_text, words_with_times, word_predicted_phonemes, word_alignments, reference_phonemes):
-        """Build comprehensive result with all required fields"""
+    def _build_comprehensive_result(self, reference_text, words_with_times, word_predicted_phonemes, word_alignments, reference_phonemes, words=None, skipped_words=()):
+        """Build comprehensive result with all required fields
+        skipped_words: words not run through Wave2Phoneme - phoneme_accuracy stays at their confidence"""
         word_results = []
         
+        if words is None:
+            words = _normalize_words(words_with_times)
+        
         # Get transcribed text from words_with_times
         transcribed_text = " ".join([w['word'] for w in words_with_times])
         
-        # Build transcribed words dict for lookup
-        transcribed_words_dict = {}
-        for word_info in words_with_times:
-            word_clean = word_info['word'].strip('.,!?;:').upper()
-            transcribed_words_dict[word_clean] = word_info
+        # Các cột SoA cho toàn bộ từ - chấm điểm một lần bằng numpy
+        n = len(words.clean)
+        pron_arr = words.confidence * 80
+        acc_arr = words.confidence.copy()
+        details_list = [[] for _ in range(n)]
+        for i, word_clean in enumerate(words.clean):
+            alignment = word_alignments.get(word_clean)
+            if alignment is not None:
+                word_score, phoneme_acc, details = score_word(alignment)
+                pron_arr[i] = word_score * 100
+                if word_clean not in skipped_words:
+                    acc_arr[i] = phoneme_acc
+                details_list[i] = details
+        
+        word_lens = np.fromiter((len(w) for w in words.clean), dtype=np.int64, count=n)
+        fluency_arr = self._word_fluency_vec(words.end - words.start, word_lens)
+        overall_arr = pron_arr * 0.6 + fluency_arr * 0.4
         
         transcribed_word_results = {}
-        for word_info in words_with_times:
-            word = word_info['word']
-            word_clean = word.strip('.,!?;:').upper()
-            confidence = word_info['confidence']
-            
-            ref_phonemes = reference_phonemes.get(word_clean, [])
-            pred_phonemes = word_predicted_phonemes.get(word_clean, [])
-            
-            if word_clean in word_alignments:
-                alignment = word_alignments[word_clean]
-                pronunciation_score, phoneme_acc, details = score_word(alignment)
-                pronunciation_score = pronunciation_score * 100
-            else:
-                pronunciation_score = confidence * 80
-                phoneme_acc = confidence
-                details = []
-            
-            word_fluency = self._calculate_word_fluency_score(word_info, len(word_clean))
-            
-            word_overall_score = (pronunciation_score * 0.6) + (word_fluency * 0.4)
-            
+        for word_clean, start, end, confidence, overall, pron, fluency, acc, details in zip(
+            words.clean, np.round(words.start, 2).tolist(), np.round(words.end, 2).tolist(), np.round(words.confidence, 2).tolist(),
+            overall_arr.tolist(), pron_arr.tolist(), fluency_arr.tolist(), acc_arr.tolist(), details_list
+        ):
             transcribed_word_results[word_clean] = {
                 'word': word_clean,
-                'start': round(word_info['start'], 2),
-                'end': round(word_info['end'], 2),
-                'score': round(word_overall_score, 1),
-                'pronunciation_score': round(pronunciation_score, 1),
-                'fluency_score': round(word_fluency, 1),
-                'phoneme_accuracy': round(phoneme_acc, 2),
-                'confidence': round(confidence, 2),
-                'reference_phonemes': ref_phonemes,
-                'predicted_phonemes': pred_phonemes,
+                'start': start,
+                'end': end,
+                'score': round(overall, 1),
+                'pronunciation_score': round(pron, 1),
+                'fluency_score': round(fluency, 1),
+                'phoneme_accuracy': round(acc, 2),
+                'confidence': confidence,
+                'reference_phonemes': reference_phonemes.get(word_clean, []),
+                'predicted_phonemes': word_predicted_phonemes.get(word_clean, []),
                 'phoneme_details': details
             }
         
@@ -473,9 +598,10 @@ class PronunciationAssessmentService:
                     'phoneme_details': []
                 })
         
-        pronunciation_score = np.mean([w['pronunciation_score'] for w in word_results]) if word_results else 0.0
+        # Only a handful of words per sentence - plain Python beats building arrays here
+        pronunciation_score = statistics.fmean(w['pronunciation_score'] for w in word_results) if word_results else 0.0
         
-        fluency_score, fluency_details = self._calculate_fluency_score(words_with_times)
+        fluency_score, fluency_details = self._calculate_fluency_score(words_with_times, words)
         
         overall_score = (pronunciation_score * 0.6) + (fluency_score * 0.4)
         
@@ -493,6 +619,8 @@ class PronunciationAssessmentService:
         # 1. Create word_errors list từ word_results đã có sẵn
         word_errors = []
         for i, word_result in enumerate(word_results):
+            if word_result['score'] >= 70:
+                continue
             word = word_result['word']
             score = word_result['score']
             
@@ -507,7 +635,7 @@ class PronunciationAssessmentService:
                     severity="high"
                 ))
             # Từ phát âm kém (score < 70)
-            elif score < 70:
+            else:
                 word_errors.append(WordError(
                     word=word,
                     position=i,
@@ -534,7 +662,7 @@ class PronunciationAssessmentService:
         llm_feedback = ""
         if self.llm_service:
             try:
-                print(f"🤖 Generating LLM feedback with {len(word_errors)} errors detected...")
+                self.logger.debug("🤖 Generating LLM feedback with %d errors detected...", len(word_errors))
                 llm_feedback = self.llm_service.generate_pronunciation_feedback(
                     original_sentence=reference_text,
                     transcribed_text=transcribed_text,
@@ -543,11 +671,11 @@ class PronunciationAssessmentService:
                     wer_score=wer_score
                 )
                 if llm_feedback:
-                    print(f"✅ LLM feedback generated ({len(llm_feedback)} chars)")
+                    self.logger.debug("✅ LLM feedback generated (%d chars)", len(llm_feedback))
                 else:
-                    print(f"⚠️  LLM returned empty feedback")
+                    self.logger.warning("⚠️  LLM returned empty feedback")
             except Exception as e:
-                print(f"⚠️  LLM feedback generation failed: {e}")
+                self.logger.warning("⚠️  LLM feedback generation failed: %s", e)
         
         # 5. Fallback to simple feedback if LLM fails
         if llm_feedback:
@@ -595,13 +723,64 @@ AUDIO_FILE = "1.wav"
 # 
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-COMPUTE_TYPE = "float32" if DEVICE == "cuda" else "int8"
 TARGET_SR = 16000
 
-print(f"🎯 Device: {DEVICE}")
-print(f"📝 Reference: '{REFERENCE_TEXT}'")
-print(f"🎵 Audio: {AUDIO_FILE}")
-print("="*80)
+# "distil-small.en" halves the decoder if its accuracy is good enough for the deployment
+WHISPER_MODEL_NAME = os.environ.get("PA_WHISPER_MODEL", "small.en")
+# "whisperx": batched ASR + wav2vec2 forced alignment (default, tighter word boundaries)
+# "faster-whisper": INT8 CTranslate2 with cross-attention word timestamps, no alignment model
+WHISPER_BACKEND = os.environ.get("PA_WHISPER_BACKEND", "whisperx")
+# CTranslate2 intra-op threads on CPU; leave the other half for Wav2Vec2 / G2P
+WHISPER_CPU_THREADS = max(1, (os.cpu_count() or 2) // 2)
+# Greedy decoding; whisperx already runs VAD before ASR
+WHISPER_ASR_OPTIONS = {"beam_size": 1}
+# VAD segments decoded per batched forward of the WhisperX pipeline
+WHISPER_BATCH_SIZE = 16
+# Words WhisperX is at least this confident about skip Wave2Phoneme (set > 1 to always run it)
+WAV2VEC2_SKIP_CONFIDENCE = float(os.environ.get("PA_W2V_SKIP_CONFIDENCE", "0.95"))
+# Context kept around the low-confidence span, in seconds
+WAV2VEC2_SPAN_PADDING = 0.1
+
+def select_compute_type(device):
+    """Pick the CTranslate2 compute type for WhisperX: float16 on CUDA, int8 on CPU, float32 if unsupported"""
+    preferred = "float16" if device == "cuda" else "int8"
+    try:
+        supported = ctranslate2.get_supported_compute_types(device)
+    except Exception:
+        return preferred
+    return preferred if preferred in supported else "float32"
+
+COMPUTE_TYPE = select_compute_type(DEVICE)
+
+def _int8_weight_compute_type(device, compute_type):
+    """INT8 weights on top of the selected activation type (float16 -> int8_float16), if the device supports it"""
+    candidate = compute_type if compute_type.startswith("int8") else f"int8_{compute_type}"
+    try:
+        supported = ctranslate2.get_supported_compute_types(device)
+    except Exception:
+        return candidate
+    return candidate if candidate in supported else compute_type
+
+@lru_cache(maxsize=2)
+def load_whisper_model(device, compute_type, model_name=WHISPER_MODEL_NAME):
+    """Load the WhisperX ASR pipeline with the configured model / compute type (cached per process)"""
+    if WHISPER_BACKEND == "faster-whisper":
+        from faster_whisper import WhisperModel
+        
+        return WhisperModel(
+            model_name,
+            device=device,
+            compute_type=_int8_weight_compute_type(device, compute_type),
+            cpu_threads=WHISPER_CPU_THREADS,
+        )
+    
+    return whisperx.load_model(
+        model_name,
+        device,
+        compute_type=compute_type,
+        asr_options=WHISPER_ASR_OPTIONS,
+        threads=WHISPER_CPU_THREADS,
+    )
 
 # ============================================================================
 # STEP 1: AUDIO PREPROCESSING
@@ -609,51 +788,88 @@ print("="*80)
 
 def preprocess_audio(audio_path, target_sr=16000):
     """Load and preprocess audio"""
-    print("\n🔧 STEP 1: Preprocessing audio...")
-    
-    audio_data, sr = librosa.load(audio_path, sr=None)
-    print(f"  ✓ Loaded: {len(audio_data)} samples @ {sr} Hz")
+    module_logger.debug("🔧 STEP 1: Preprocessing audio...")
     
-    if sr != target_sr:
-        audio_data = resampy.resample(audio_data, sr, target_sr)
+    sr = sf.info(audio_path).samplerate
+    if sr == target_sr:
+        audio_data, sr = sf.read(audio_path, dtype='float32')
+        if audio_data.ndim > 1:
+            audio_data = audio_data.mean(axis=1, dtype=np.float32)
+    else:
+        # Decode + downmix + resample block by block: the native-rate signal is never held in full
+        stream = soxr.ResampleStream(sr, target_sr, 1, dtype='float32', quality='HQ')
+        pieces = [
+            stream.resample_chunk(block.mean(axis=1, dtype=np.float32))
+            for block in sf.blocks(audio_path, blocksize=1 << 16, dtype='float32', always_2d=True)
+        ]
+        pieces.append(stream.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+        audio_data = np.concatenate(pieces)
         sr = target_sr
-        print(f"  ✓ Resampled to {target_sr} Hz")
+        module_logger.debug("  ✓ Resampled to %d Hz while decoding", target_sr)
+    module_logger.debug("  ✓ Loaded: %d samples @ %d Hz", len(audio_data), sr)
     
-    # Normalize
+    # Normalize in place (peak from max/min, no abs() temporary)
     if len(audio_data) > 0:
-        max_val = np.abs(audio_data).max()
-        if max_val > 0:
-            audio_data = audio_data / max_val * 0.95
-        print(f"  ✓ Normalized")
+        peak = max(float(audio_data.max()), -float(audio_data.min()))
+        if peak > 0:
+            np.multiply(audio_data, 0.95 / peak, out=audio_data)
+        module_logger.debug("  ✓ Normalized")
     
     return audio_data, sr
 
+def _b64_to_bytes(audio_base64, chunk_size=1 << 20):
+    """
+    Decode base64 audio in 1 MiB blocks into a preallocated buffer
+    Falls back to base64.b64decode when the input is not cleanly 4-char aligned
+    """
+    # Strip "data:audio/...;base64," prefix if the client left it in
+    if audio_base64.startswith('data:'):
+        audio_base64 = audio_base64.split(',', 1)[-1]
+    
+    buf = bytearray((len(audio_base64) * 3) // 4)
+    pos = 0
+    try:
+        for start in range(0, len(audio_base64), chunk_size):
+            decoded = binascii.a2b_base64(audio_base64[start:start + chunk_size])
+            buf[pos:pos + len(decoded)] = decoded
+            pos += len(decoded)
+    except binascii.Error:
+        # Whitespace inside the string shifts the block boundaries
+        return base64.b64decode(audio_base64)
+    
+    del buf[pos:]
+    return buf
+
 # ============================================================================
 # STEP 2: WHISPERX - WORD TIMESTAMPS
 # ============================================================================
 
-def get_word_timestamps(audio_path, whisper_model=None, align_model=None, align_metadata=None, device=None):
-    """Get word-level timestamps using WhisperX"""
-    print("\n🎤 STEP 2: WhisperX for word timestamps...")
+def get_word_timestamps(audio, sr=TARGET_SR, whisper_model=None, align_model=None, align_metadata=None, device=None):
+    """Get word-level timestamps using WhisperX (audio: float32 array, no temp file / ffmpeg decode)"""
+    module_logger.debug("🎤 STEP 2: WhisperX for word timestamps...")
     
     if whisper_model is None:
         device = device or DEVICE
-        print("Fallback: Load model nếu chưa được truyền vào")
-        whisper_model = whisperx.load_model("small.en", device, compute_type=COMPUTE_TYPE)
+        module_logger.debug("Fallback: Load model nếu chưa được truyền vào")
+        whisper_model = load_whisper_model(device, COMPUTE_TYPE)
     
     if device is None:
         device = DEVICE
     
-    audio = whisperx.load_audio(audio_path)
-    result = whisper_model.transcribe(audio, batch_size=8)
-    print(f"  ✓ Transcribed: {result['segments'][0]['text'] if result['segments'] else 'N/A'}")
+    # WhisperX expects 16kHz float32 mono
+    if sr != TARGET_SR:
+        audio = soxr.resample(audio, sr, TARGET_SR, quality='HQ')
+    audio = np.asarray(audio, dtype=np.float32)
+    
+    if WHISPER_BACKEND == "faster-whisper":
+        return _faster_whisper_word_timestamps(whisper_model, audio)
+    
+    result = whisper_model.transcribe(audio, batch_size=WHISPER_BATCH_SIZE)
+    module_logger.debug("  ✓ Transcribed: %s", result['segments'][0]['text'] if result['segments'] else 'N/A')
     
     if align_model is None or align_metadata is None:
-        print("Fallback: align_model nếu chưa được truyền vào")
-        align_model, align_metadata = whisperx.load_align_model(
-            language_code=result["language"], 
-            device=device
-        )
+        module_logger.debug("Fallback: align_model nếu chưa được truyền vào")
+        align_model, align_metadata = load_align_model(result["language"], device)
     
     result_aligned = whisperx.align(
         result["segments"], 
@@ -673,39 +889,91 @@ def get_word_timestamps(audio_path, whisper_model=None, align_model=None, align_
                 "confidence": word.get("score", 0.9)
             })
     
-    print(f"  ✓ Detected {len(words_with_times)} words")
+    module_logger.debug("  ✓ Detected %d words", len(words_with_times))
     for w in words_with_times:
-        print(f"    {w['word']:12} [{w['start']:.2f}s - {w['end']:.2f}s]")
+        module_logger.debug("    %-12s [%.2fs - %.2fs]", w['word'], w['start'], w['end'])
+    
+    return words_with_times
+
+def _faster_whisper_word_timestamps(whisper_model, audio):
+    """Word timestamps straight from faster-whisper (word_timestamps=True), same shape as the WhisperX path"""
+    segments, _ = whisper_model.transcribe(audio, beam_size=1, word_timestamps=True, vad_filter=True)
+    
+    words_with_times = []
+    for segment in segments:
+        for word in segment.words or []:
+            words_with_times.append({
+                "word": word.word.strip().upper(),
+                "start": word.start,
+                "end": word.end,
+                "confidence": word.probability
+            })
     
+    module_logger.debug("  ✓ Detected %d words", len(words_with_times))
     return words_with_times
 
+@lru_cache(maxsize=1)
+def load_align_model(language_code, device):
+    """WhisperX wav2vec2 alignment model + metadata (cached per process)"""
+    return whisperx.load_align_model(language_code=language_code, device=device)
+
+@dataclass(slots=True)
+class WordsSoA:
+    """Column (SoA) view of words_with_times, normalized once per request"""
+    clean: List[str]
+    start: np.ndarray
+    end: np.ndarray
+    confidence: np.ndarray
+
+def _normalize_words(words_with_times):
+    """Split words_with_times into parallel word_clean / start / end / confidence columns"""
+    count = len(words_with_times)
+    return WordsSoA(
+        clean=[w['word'].strip('.,!?;:').upper() for w in words_with_times],
+        start=np.fromiter((w['start'] for w in words_with_times), dtype=np.float64, count=count),
+        end=np.fromiter((w['end'] for w in words_with_times), dtype=np.float64, count=count),
+        confidence=np.fromiter((w['confidence'] for w in words_with_times), dtype=np.float64, count=count),
+    )
+
 # ============================================================================
 # STEP 3: G2P - REFERENCE PHONEMES
 # ============================================================================
 
+_default_g2p = None
+_g2p_lock = threading.Lock()
+
+def get_g2p():
+    """Shared G2p instance (one model in memory, one set of cache entries)"""
+    global _default_g2p
+    if _default_g2p is None:
+        with _g2p_lock:
+            if _default_g2p is None:
+                _default_g2p = G2p()
+    return _default_g2p
+
+@lru_cache(maxsize=65536)
+def _word_to_phonemes(word_lower, g2p):
+    """ARPAbet phonemes for one word (CMUdict, G2P model for OOV), cached across requests"""
+    if word_lower in arpabet:
+        return tuple(p.rstrip('012') for p in arpabet[word_lower][0])
+    return tuple(p.upper() for p in g2p(word_lower) if p.isalnum())
+
 def get_reference_phonemes(text, g2p=None):
     """Generate reference phonemes using G2P"""
-    print("\n📚 STEP 3: Generating reference phonemes...")
+    module_logger.debug("📚 STEP 3: Generating reference phonemes...")
     
     if g2p is None:
-        print("Fallback: Load g2p nếu chưa được truyền vào")
-        g2p = G2p()
+        # One shared instance, so cache entries stay keyed to the same model
+        g2p = get_g2p()
     
     words = text.upper().split()
     
     phoneme_dict = {}
     for word in words:
-        word_lower = word.lower()
-        
-        if word_lower in arpabet:
-            phonemes = arpabet[word_lower][0]
-            phonemes = [p.rstrip('012') for p in phonemes]
-        else:
-            phonemes = g2p(word_lower)
-            phonemes = [p.upper() for p in phonemes if p.isalnum()]
+        phonemes = list(_word_to_phonemes(word.lower(), g2p))
         
         phoneme_dict[word] = phonemes
-        print(f"  {word:12} → {' '.join(phonemes)}")
+        module_logger.debug("  %-12s → %s", word, ' '.join(phonemes))
     
     return phoneme_dict
 
@@ -713,48 +981,135 @@ def get_reference_phonemes(text, g2p=None):
 # STEP 4: WAVE2PHONEME - FULL AUDIO PHONEME PREDICTION
 # ============================================================================
 
+WAVE2PHONEME_MODEL_NAME = "facebook/wav2vec2-lv-60-espeak-cv-ft"
+
+class SimpleProcessor:
+    """
+    Tokenizer + feature extractor pair exposing the Wav2Vec2Processor calls used here
+    Feature extraction is not called: predict_phonemes_full_audio normalizes on-device itself
+    """
+    
+    def __init__(self, tokenizer, feature_extractor):
+        self.tokenizer = tokenizer
+        self.feature_extractor = feature_extractor
+    
+    def batch_decode(self, token_ids):
+        return self.tokenizer.batch_decode(token_ids)
+
+@lru_cache(maxsize=1)
+def _load_wave2phoneme(model_name, device):
+    """Load processor + model once per process; raises so failures are not cached"""
+    from transformers import Wav2Vec2CTCTokenizer, Wav2Vec2FeatureExtractor
+    
+    tokenizer = Wav2Vec2CTCTokenizer.from_pretrained(model_name)
+    feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
+    processor = SimpleProcessor(tokenizer, feature_extractor)
+    
+    model = Wav2Vec2ForCTC.from_pretrained(model_name)
+    model.eval()
+    if device == "cuda":
+        model = model.to(device)
+    return processor, model
+
 def load_wave2phoneme_model():
     """Load Wav2Vec2 phoneme recognition model"""
-    print("\n🧠 STEP 4: Loading Wave2Phoneme model...")
-    
-    model_name = "facebook/wav2vec2-lv-60-espeak-cv-ft"
+    module_logger.debug("🧠 STEP 4: Loading Wave2Phoneme model...")
     
     try:
-        from transformers import Wav2Vec2CTCTokenizer, Wav2Vec2FeatureExtractor
-        
-        tokenizer = Wav2Vec2CTCTokenizer.from_pretrained(model_name)
-        feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
-        
-        class SimpleProcessor:
-            def __init__(self, tokenizer, feature_extractor):
-                self.tokenizer = tokenizer
-                self.feature_extractor = feature_extractor
-            
-            def __call__(self, audio, sampling_rate, return_tensors="pt", padding=True):
-                return self.feature_extractor(
-                    audio, 
-                    sampling_rate=sampling_rate, 
-                    return_tensors=return_tensors, 
-                    padding=padding
-                )
-            
-            def batch_decode(self, token_ids):
-                return self.tokenizer.batch_decode(token_ids)
-        
-        processor = SimpleProcessor(tokenizer, feature_extractor)
-        model = Wav2Vec2ForCTC.from_pretrained(model_name)
-        model.eval()
-        
-        if DEVICE == "cuda":
-            model = model.to(DEVICE)
-        
-        print(f"  ✓ Loaded: {model_name}")
+        processor, model = _load_wave2phoneme(WAVE2PHONEME_MODEL_NAME, DEVICE)
+        module_logger.debug("  ✓ Loaded: %s", WAVE2PHONEME_MODEL_NAME)
         return processor, model
         
     except Exception as e:
-        print(f"  ⚠️  Error: {e}")
+        module_logger.warning("  ⚠️  Error: %s", e)
         return None, None
 
+class OnnxWave2PhonemeModel:
+    """ONNX Runtime stand-in for Wav2Vec2ForCTC: model(input_values).logits"""
+    
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+    
+    def __call__(self, input_values):
+        logits = self.session.run(None, {self.input_name: input_values.detach().cpu().numpy()})[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+class _LogitsOnly(torch.nn.Module):
+    """Wrap Wav2Vec2ForCTC so ONNX export sees a single logits output"""
+    
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+    
+    def forward(self, input_values):
+        return self.model(input_values).logits
+
+# torch.compile mode for Wave2Phoneme; "reduce-overhead" adds CUDA graphs but records one per
+# distinct audio length, so it only pays off when inputs are bucketed to a few lengths
+W2V_COMPILE_MODE = os.environ.get("PA_W2V_COMPILE_MODE", "default")
+# CPU inference: INT8 dynamic quantization of the transformer Linear layers (conv front-end stays fp32)
+W2V_CPU_INT8 = os.environ.get("PA_W2V_INT8", "1") == "1"
+
+def optimize_wave2phoneme_model(model):
+    """
+    Speed up the repeated Wav2Vec2 forward pass
+    - PA_USE_TENSORRT=1: export to ONNX and run with ONNX Runtime (TensorRT -> CUDA -> CPU providers)
+    - CPU: dynamic INT8 quantization of the Linear layers (FBGEMM), unless PA_W2V_INT8=0
+    - otherwise: torch.compile (dynamic shapes, audio length changes every request)
+    A 1-second dummy forward triggers compilation; on any failure the eager model is returned
+    """
+    model_device = next(model.parameters()).device
+    dummy = torch.zeros(1, TARGET_SR, device=model_device)
+    
+    if os.getenv("PA_USE_TENSORRT") == "1":
+        try:
+            import onnxruntime as ort
+            
+            onnx_path = os.getenv("PA_ONNX_PATH", "wav2vec2_phoneme.onnx")
+            if not os.path.exists(onnx_path):
+                module_logger.debug("  🔧 Exporting Wave2Phoneme model to ONNX: %s", onnx_path)
+                with torch.no_grad():
+                    torch.onnx.export(
+                        _LogitsOnly(model), (dummy,), onnx_path,
+                        input_names=["input_values"], output_names=["logits"],
+                        dynamic_axes={"input_values": {0: "batch", 1: "samples"}, "logits": {0: "batch", 1: "frames"}},
+                        opset_version=17
+                    )
+            
+            providers = [p for p in ("TensorrtExecutionProvider", "CUDAExecutionProvider", "CPUExecutionProvider")
+                         if p in ort.get_available_providers()]
+            onnx_model = OnnxWave2PhonemeModel(ort.InferenceSession(onnx_path, providers=providers))
+            onnx_model(dummy)
+            module_logger.debug("  ✓ Wave2Phoneme running on ONNX Runtime (%s)", providers[0])
+            return onnx_model
+        except Exception as e:
+            module_logger.warning("  ⚠️  ONNX Runtime export failed, falling back: %s", e)
+    
+    if model_device.type == "cpu" and W2V_CPU_INT8:
+        try:
+            # Returns a quantized copy - a model shared with PhonemeService stays fp32
+            quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            with torch.no_grad():
+                quantized(dummy)
+            module_logger.debug("  ✓ Wave2Phoneme Linear layers quantized to INT8")
+            return quantized
+        except Exception as e:
+            module_logger.warning("  ⚠️  INT8 quantization failed, keeping fp32: %s", e)
+    
+    if not hasattr(torch, "compile"):
+        return model
+    
+    try:
+        compiled = torch.compile(model, mode=W2V_COMPILE_MODE, dynamic=True)
+        with torch.no_grad():
+            compiled(dummy)
+        module_logger.debug("  ✓ Wave2Phoneme model compiled with torch.compile (%s)", W2V_COMPILE_MODE)
+        return compiled
+    except Exception as e:
+        module_logger.warning("  ⚠️  torch.compile unavailable, using eager model: %s", e)
+        return model
+
 # IPA to ARPAbet mapping
 IPA_TO_ARPABET = {
     # Vowels
@@ -774,40 +1129,77 @@ IPA_TO_ARPABET = {
     'tʃ': 'CH', 'dʒ': 'JH',
 }
 
+# Longest symbols first so 'tʃ' / 'aɪ' win over 't' / 'a'; '.' consumes anything else one char at a time
+_IPA_RE = re.compile(
+    '|'.join(map(re.escape, sorted(IPA_TO_ARPABET, key=len, reverse=True))) + '|.',
+    re.DOTALL
+)
+
 def ipa_to_arpabet(ipa_string):
     """Convert IPA string to ARPAbet list"""
     if not ipa_string:
         return []
     
-    result = []
-    i = 0
-    while i < len(ipa_string):
-        if i < len(ipa_string) - 1:
-            two_char = ipa_string[i:i+2]
-            if two_char in IPA_TO_ARPABET:
-                result.append(IPA_TO_ARPABET[two_char])
-                i += 2
-                continue
-        
-        one_char = ipa_string[i]
-        if one_char in IPA_TO_ARPABET:
-            result.append(IPA_TO_ARPABET[one_char])
-        elif one_char.isalpha():
-            result.append(one_char.upper())
-        
-        i += 1
-    
-    return result
+    # Unknown letters are kept (upper-cased), spaces / stress marks are dropped
+    get = IPA_TO_ARPABET.get
+    return [
+        get(token) or token.upper()
+        for token in _IPA_RE.findall(ipa_string)
+        if token in IPA_TO_ARPABET or token.isalpha()
+    ]
+
+# Long audio: chunk length / overlap in seconds, chunks per batched forward
+W2V_CHUNK_SECONDS = 10
+W2V_CHUNK_OVERLAP_SECONDS = 0.5
+W2V_CHUNK_BATCH = 8
+# Wav2Vec2 conv feature encoder stride (samples per logit frame at 16 kHz)
+W2V_FRAME_STRIDE = 320
+
+def _chunked_logits(model, audio_t, sr=16000):
+    """
+    Run Wave2Phoneme over overlapping fixed-size chunks in batches and stitch the logits
+    Each chunk drops half of every overlap so no frame is counted twice
+    """
+    chunk = int(W2V_CHUNK_SECONDS * sr)
+    overlap = int(W2V_CHUNK_OVERLAP_SECONDS * sr)
+    step = chunk - overlap
+    num_samples = audio_t.shape[0]
+    
+    # Zero-pad the tail so the last window is full, then view as (B, chunk) without copying
+    num_chunks = max(1, -(-(num_samples - overlap) // step))
+    pad = (num_chunks - 1) * step + chunk - num_samples
+    if pad > 0:
+        audio_t = torch.nn.functional.pad(audio_t, (0, pad))
+    windows = audio_t.unfold(0, chunk, step)
+    
+    # Chunk k keeps local frames [head, step_frames + head): the next chunk picks up exactly there
+    step_frames = step // W2V_FRAME_STRIDE
+    head = (overlap // W2V_FRAME_STRIDE) // 2
+    
+    pieces = []
+    for b in range(0, num_chunks, W2V_CHUNK_BATCH):
+        batch_logits = model(windows[b:b + W2V_CHUNK_BATCH].contiguous()).logits
+        for k in range(batch_logits.shape[0]):
+            idx = b + k
+            frames = batch_logits[k]
+            lo = head if idx > 0 else 0
+            hi = min(step_frames + head, frames.shape[0]) if idx < num_chunks - 1 else frames.shape[0]
+            pieces.append(frames[lo:hi])
+    
+    # Drop frames that only cover the zero padding
+    logits = torch.cat(pieces, dim=0)[:max(1, num_samples // W2V_FRAME_STRIDE)]
+    return logits.unsqueeze(0)
 
-def predict_phonemes_full_audio(audio_data, sr, processor, model, device=None):
+def predict_phonemes_full_audio(audio_data, sr, processor, model, device=None, stream=None):
     """
     Predict phonemes from FULL audio (not segmented)
     This preserves context and avoids cutting issues
+    stream: optional CUDA stream to run the upload + forward on
     """
-    print("\n🔬 STEP 5: Predicting phonemes from FULL audio...")
+    module_logger.debug("🔬 STEP 5: Predicting phonemes from FULL audio...")
     
     if processor is None or model is None:
-        print("  ⚠️  No model available")
+        module_logger.warning("  ⚠️  No model available")
         return []
     
     if device is None:
@@ -816,70 +1208,77 @@ def predict_phonemes_full_audio(audio_data, sr, processor, model, device=None):
     try:
         # Ensure 16kHz
         if sr != 16000:
-            audio_data = resampy.resample(audio_data, sr, 16000)
-        
-        # Process full audio
-        inputs = processor(
-            audio_data, 
-            sampling_rate=16000, 
-            return_tensors="pt", 
-            padding=True
-        )
-        
-        if isinstance(inputs, dict):
-            input_values = inputs['input_values']
-        else:
-            input_values = inputs.input_values
-        
-        if device == "cuda":
-            input_values = input_values.to(device)
-        
-        # Inference on full audio
-        with torch.no_grad():
-            logits = model(input_values).logits
-        
-        # Decode to IPA
-        predicted_ids = torch.argmax(logits, dim=-1)
-        ipa_phonemes = processor.batch_decode(predicted_ids)[0]
+            audio_data = soxr.resample(audio_data, sr, 16000, quality='HQ')
+        
+        stream_ctx = torch.cuda.stream(stream) if (stream is not None and device == "cuda") else nullcontext()
+        with stream_ctx:
+            # Feature extraction on the target device: upload raw audio once, then apply
+            # Wav2Vec2FeatureExtractor's zero-mean / unit-variance normalization as tensor ops
+            audio_t = torch.from_numpy(np.ascontiguousarray(audio_data, dtype=np.float32))
+            if device == "cuda":
+                # Page-locked staging buffer so the H2D copy is truly async on this stream
+                audio_t = audio_t.pin_memory().to(device, non_blocking=True)
+            
+            if getattr(processor.feature_extractor, "do_normalize", True):
+                audio_t = (audio_t - audio_t.mean()) / torch.sqrt(audio_t.var(unbiased=False) + 1e-7)
+            
+            # Inference on full audio (single forward; fp16 autocast on CUDA),
+            # long audio goes through in overlapping chunks instead
+            with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=(device == "cuda")):
+                if audio_t.shape[0] > W2V_CHUNK_SECONDS * 16000:
+                    logits = _chunked_logits(model, audio_t)
+                else:
+                    logits = model(audio_t.unsqueeze(0)).logits
+            
+            # CTC greedy decode on the device: collapse repeats, drop blanks, then ship only
+            # the surviving ids (.cpu() inside the stream context waits on this stream only)
+            predicted_ids = torch.unique_consecutive(torch.argmax(logits, dim=-1)[0])
+            predicted_ids = predicted_ids[predicted_ids != processor.tokenizer.pad_token_id].cpu().tolist()
+        # Ids đã collapse + bỏ blank ở trên nên decode không group lại; tokens nối bằng ""
+        # (word delimiter -> " ") giống hệt chuỗi batch_decode(argmax ids) trước đây,
+        # để ipa_to_arpabet vẫn ghép được tʃ / aɪ / dʒ / ɑː
+        ipa_phonemes = processor.tokenizer.decode(predicted_ids, group_tokens=False)
         
-        print(f"  ✓ IPA output: {ipa_phonemes[:100]}...")
+        module_logger.debug("  ✓ IPA output: %s...", ipa_phonemes[:100])
         
         # Convert to ARPAbet
         arpabet_phonemes = ipa_to_arpabet(ipa_phonemes)
         
-        print(f"  ✓ Total phonemes predicted: {len(arpabet_phonemes)}")
-        print(f"  ✓ Phoneme sequence: {' '.join(arpabet_phonemes[:20])}...")
+        module_logger.debug("  ✓ Total phonemes predicted: %d", len(arpabet_phonemes))
+        module_logger.debug("  ✓ Phoneme sequence: %s...", ' '.join(arpabet_phonemes[:20]))
         
         return arpabet_phonemes
     
     except Exception as e:
-        print(f"  ⚠️  Error: {e}")
+        module_logger.warning("  ⚠️  Error: %s", e)
         return []
 
 # ============================================================================
 # STEP 6: ALIGN FULL PREDICTED WITH FULL REFERENCE, THEN SPLIT BY WORDS
 # ============================================================================
 
-def align_phonemes_to_words_v2(predicted_phonemes, reference_phoneme_dict, words_with_times):
+def align_phonemes_to_words_v2(predicted_phonemes, reference_phoneme_dict, words_with_times, words=None):
     """
     Improved alignment strategy:
     1. Build full reference phoneme sequence from words
     2. Align full predicted vs full reference using Levenshtein
     3. Split aligned sequence back into words based on reference boundaries
     """
-    print("\n🎯 STEP 6: Aligning phonemes (improved method)...")
+    module_logger.debug("🎯 STEP 6: Aligning phonemes (improved method)...")
     
     if not predicted_phonemes:
-        print("  ⚠️  No predicted phonemes")
+        module_logger.warning("  ⚠️  No predicted phonemes")
         return {}
     
+    if words is None:
+        words = _normalize_words(words_with_times)
+    
     # Build full reference sequence with word boundaries
     full_reference = []
     word_boundaries = []  # Track where each word starts/ends in reference
     current_pos = 0
     
-    for word_info in words_with_times:
-        word_clean = word_info['word'].strip('.,!?;:').upper()
+    for word_clean in words.clean:
         ref_phonemes = reference_phoneme_dict.get(word_clean, [])
         
         if ref_phonemes:
@@ -892,54 +1291,46 @@ def align_phonemes_to_words_v2(predicted_phonemes, reference_phoneme_dict, words
             full_reference.extend(ref_phonemes)
             current_pos += len(ref_phonemes)
     
-    print(f"  Full reference: {' '.join(full_reference)}")
-    print(f"  Full predicted: {' '.join(predicted_phonemes)}")
+    module_logger.debug("  Full reference: %s", ' '.join(full_reference))
+    module_logger.debug("  Full predicted: %s", ' '.join(predicted_phonemes))
+    
+    # Align full sequences (banded - both sides describe the same utterance)
+    alignment = align_phoneme_sequences_banded(full_reference, predicted_phonemes)
     
-    # Align full sequences
-    alignment = align_phoneme_sequences(full_reference, predicted_phonemes)
+    module_logger.debug("  Total alignment pairs: %d", len(alignment))
     
-    print(f"  Total alignment pairs: {len(alignment)}")
+    # Split alignment back into words in a single pass:
+    # pairs go to the current word until its last reference phoneme is consumed
+    per_word_alignment = [[] for _ in word_boundaries]
+    per_word_pred = [[] for _ in word_boundaries]
+    
+    cur_word = 0
+    cum_ref = 0
+    num_words = len(word_boundaries)
+    for pair in alignment:
+        if cur_word >= num_words:
+            break
+        
+        ref_ph, pred_ph, _ = pair
+        per_word_alignment[cur_word].append(pair)
+        if pred_ph != '-':
+            per_word_pred[cur_word].append(pred_ph)
+        
+        # Insertions ('-' on the reference side) don't count toward the word
+        if ref_ph != '-':
+            cum_ref += 1
+            if cum_ref == word_boundaries[cur_word]['end_idx']:
+                cur_word += 1
     
-    # Split alignment back into words
     word_phonemes = {}
     word_alignments = {}
     
-    ref_idx = 0
-    for boundary in word_boundaries:
+    for boundary, word_alignment, word_pred_phonemes in zip(word_boundaries, per_word_alignment, per_word_pred):
         word = boundary['word']
-        start_idx = boundary['start_idx']
-        end_idx = boundary['end_idx']
-        
-        # Extract alignment pairs for this word
-        word_alignment = []
-        word_pred_phonemes = []
-        
-        # Count through alignment until we've covered this word's reference phonemes
-        ref_count = 0
-        align_idx = ref_idx
-        
-        while ref_count < (end_idx - start_idx) and align_idx < len(alignment):
-            ref_ph, pred_ph, is_correct = alignment[align_idx]
-            
-            if ref_ph != '-':  # This counts as a reference phoneme
-                word_alignment.append((ref_ph, pred_ph, is_correct))
-                if pred_ph != '-':
-                    word_pred_phonemes.append(pred_ph)
-                ref_count += 1
-                align_idx += 1
-            else:
-                # Insertion - doesn't count toward reference but include it
-                word_alignment.append((ref_ph, pred_ph, is_correct))
-                if pred_ph != '-':
-                    word_pred_phonemes.append(pred_ph)
-                align_idx += 1
-        
-        ref_idx = align_idx
-        
         word_phonemes[word] = word_pred_phonemes
         word_alignments[word] = word_alignment
         
-        print(f"  {word:12} Ref: {' '.join(boundary['phonemes']):20} Pred: {' '.join(word_pred_phonemes)}")
+        module_logger.debug("  %-12s Ref: %-20s Pred: %s", word, ' '.join(boundary['phonemes']), ' '.join(word_pred_phonemes))
     
     return word_phonemes, word_alignments
 
@@ -947,98 +1338,296 @@ def align_phonemes_to_words_v2(predicted_phonemes, reference_phoneme_dict, words
 # STEP 7: PHONEME ALIGNMENT (Levenshtein)
 # ============================================================================
 
+# Phoneme symbol -> small int ID; sequences are aligned as str of chr(ID),
+# so rapidfuzz takes its bit-parallel path and the DP compares single chars
+PHONEME2ID = {}
+_phoneme_id_lock = threading.Lock()
+
+def _phoneme_id(phoneme):
+    pid = PHONEME2ID.get(phoneme)
+    if pid is None:
+        with _phoneme_id_lock:
+            pid = PHONEME2ID.setdefault(phoneme, len(PHONEME2ID))
+    return pid
+
+def encode_phonemes(phonemes):
+    """Encode a phoneme list as a string with one code point per phoneme"""
+    return ''.join([chr(_phoneme_id(p)) for p in phonemes])
+
+for _ph in dict.fromkeys(IPA_TO_ARPABET.values()):
+    _phoneme_id(_ph)
+
 def align_phoneme_sequences(reference, predicted):
-    """Align two phoneme sequences using dynamic programming"""
+    """Align two phoneme sequences (Levenshtein opcodes computed in C by rapidfuzz)"""
     if not reference or not predicted:
         return []
     
     ref = list(reference)
     pred = list(predicted)
     
-    m, n = len(ref), len(pred)
-    dp = [[0] * (n + 1) for _ in range(m + 1)]
-    
-    for i in range(m + 1):
-        dp[i][0] = i
-    for j in range(n + 1):
-        dp[0][j] = j
-    
-    for i in range(1, m + 1):
-        for j in range(1, n + 1):
-            if ref[i-1] == pred[j-1]:
-                dp[i][j] = dp[i-1][j-1]
-            else:
-                dp[i][j] = 1 + min(dp[i-1][j], dp[i][j-1], dp[i-1][j-1])
+    if Levenshtein is None:
+        return _align_phoneme_sequences_dp(ref, pred)
     
-    # Backtrack
     alignment = []
-    i, j = m, n
+    for tag, i1, i2, j1, j2 in Levenshtein.opcodes(encode_phonemes(ref), encode_phonemes(pred)):
+        if tag == 'equal':
+            alignment.extend((r, p, True) for r, p in zip(ref[i1:i2], pred[j1:j2]))
+        elif tag == 'replace':
+            alignment.extend((r, p, False) for r, p in zip(ref[i1:i2], pred[j1:j2]))
+        elif tag == 'delete':
+            alignment.extend((r, '-', False) for r in ref[i1:i2])
+        else:  # insert
+            alignment.extend(('-', p, False) for p in pred[j1:j2])
     
+    return alignment
+
+def _backtrack_alignment(ref, pred, ref_ids, pred_ids, cell):
+    """Walk the DP table back from (m, n): match first, then substitution, deletion, insertion"""
+    alignment = []
+    i, j = len(ref), len(pred)
+
     while i > 0 or j > 0:
-        if i > 0 and j > 0 and ref[i-1] == pred[j-1]:
+        if i > 0 and j > 0 and ref_ids[i-1] == pred_ids[j-1]:
             alignment.append((ref[i-1], pred[j-1], True))
             i -= 1
             j -= 1
-        elif i > 0 and j > 0 and dp[i][j] == dp[i-1][j-1] + 1:
+        elif i > 0 and j > 0 and cell(i, j) == cell(i-1, j-1) + 1:
             alignment.append((ref[i-1], pred[j-1], False))
             i -= 1
             j -= 1
-        elif i > 0 and (j == 0 or dp[i][j] == dp[i-1][j] + 1):
+        elif i > 0 and (j == 0 or cell(i, j) == cell(i-1, j) + 1):
             alignment.append((ref[i-1], '-', False))
             i -= 1
         else:
             alignment.append(('-', pred[j-1], False))
             j -= 1
-    
+
     alignment.reverse()
     return alignment
 
+if njit is not None:
+    @njit(cache=True)
+    def _dp_table_numba(ref_arr, pred_arr):
+        """Full Levenshtein table over int phoneme IDs, compiled with numba"""
+        m, n = ref_arr.shape[0], pred_arr.shape[0]
+        dp = np.empty((m + 1, n + 1), dtype=np.int32)
+        for j in range(n + 1):
+            dp[0, j] = j
+        for i in range(1, m + 1):
+            dp[i, 0] = i
+            r = ref_arr[i - 1]
+            for j in range(1, n + 1):
+                if r == pred_arr[j - 1]:
+                    dp[i, j] = dp[i - 1, j - 1]
+                else:
+                    dp[i, j] = 1 + min(dp[i - 1, j], dp[i, j - 1], dp[i - 1, j - 1])
+        return dp
+
+    @njit(cache=True)
+    def _banded_table_numba(ref_arr, pred_arr, band):
+        """Banded Levenshtein table: cell (i, j) stored at dp[i, j - i + band], |i - j| <= band"""
+        m, n = ref_arr.shape[0], pred_arr.shape[0]
+        inf = m + n + 1
+        width = 2 * band + 1
+        dp = np.full((m + 1, width), inf, dtype=np.int32)
+        for j in range(min(n, band) + 1):
+            dp[0, j + band] = j
+        for i in range(1, m + 1):
+            r = ref_arr[i - 1]
+            for j in range(max(0, i - band), min(n, i + band) + 1):
+                k = j - i + band
+                if j == 0:
+                    dp[i, k] = i
+                    continue
+                diag = dp[i - 1, k]
+                if r == pred_arr[j - 1]:
+                    dp[i, k] = diag
+                    continue
+                up = dp[i - 1, k + 1] if k + 1 < width else inf
+                left = dp[i, k - 1] if k > 0 else inf
+                dp[i, k] = 1 + min(up, left, diag)
+        return dp
+else:
+    _dp_table_numba = None
+    _banded_table_numba = None
+
+def _align_phoneme_sequences_dp(ref, pred):
+    """
+    Full Levenshtein DP, used when rapidfuzz is not installed
+    The table is filled by a numba kernel when available, otherwise each row is computed with NumPy: substitution/deletion from the previous row, then the
+    left-to-right insertion chain as a running minimum, row[j] = j + min_k<=j (cand[k] - k)
+    """
+    ref_ids = encode_phonemes(ref)
+    pred_ids = encode_phonemes(pred)
+    m, n = len(ref), len(pred)
+
+    ref_arr = np.fromiter(map(ord, ref_ids), dtype=np.int32, count=m)
+    pred_arr = np.fromiter(map(ord, pred_ids), dtype=np.int32, count=n)
+
+    if _dp_table_numba is not None:
+        dp = _dp_table_numba(ref_arr, pred_arr)
+    else:
+        cols = np.arange(n + 1, dtype=np.int32)
+        dp = np.empty((m + 1, n + 1), dtype=np.int32)
+        dp[0] = cols
+        cand = np.empty(n + 1, dtype=np.int32)
+        for i in range(1, m + 1):
+            prev = dp[i - 1]
+            cand[0] = i
+            np.minimum(prev[1:] + 1, prev[:-1] + (pred_arr != ref_arr[i - 1]), out=cand[1:])
+            np.minimum.accumulate(cand - cols, out=dp[i])
+            dp[i] += cols
+
+    rows = dp.tolist()
+    return _backtrack_alignment(ref, pred, ref_ids, pred_ids, lambda i, j: rows[i][j])
+
+def align_phoneme_sequences_banded(reference, predicted, band=None):
+    """
+    Align two phoneme sequences using a banded DP (Ukkonen)
+    Only cells with |i - j| <= band are computed. The band is doubled until
+    the edit distance fits inside it, so the alignment is optimal (same distance as the full DP)
+    """
+    if not reference or not predicted:
+        return []
+
+    ref = list(reference)
+    pred = list(predicted)
+    ref_ids = encode_phonemes(ref)
+    pred_ids = encode_phonemes(pred)
+
+    m, n = len(ref), len(pred)
+    if band is None:
+        band = max(8, abs(m - n) + 4)
+    band = max(band, abs(m - n))
+    inf = m + n + 1
+
+    if _banded_table_numba is not None:
+        ref_arr = np.fromiter(map(ord, ref_ids), dtype=np.int32, count=m)
+        pred_arr = np.fromiter(map(ord, pred_ids), dtype=np.int32, count=n)
+
+    while True:
+        # Band covers the whole matrix - run the full DP (same backtrack/tie order as below)
+        if band >= max(m, n):
+            return _align_phoneme_sequences_dp(ref, pred)
+
+        if _banded_table_numba is not None:
+            # Compiled kernel over a dense (m + 1, 2 * band + 1) diagonal strip
+            dp = _banded_table_numba(ref_arr, pred_arr, band)
+            if dp[m, n - m + band] <= band:
+                strip = dp.tolist()
+                width = 2 * band + 1
+
+                def cell(i, j):
+                    k = j - i + band
+                    return strip[i][k] if 0 <= k < width else inf
+
+                return _backtrack_alignment(ref, pred, ref_ids, pred_ids, cell)
+            band *= 2
+            continue
+
+        # Row i only stores columns lows[i]..min(n, i + band)
+        rows = [list(range(min(n, band) + 1))]
+        lows = [0]
+        for i in range(1, m + 1):
+            lo = max(0, i - band)
+            hi = min(n, i + band)
+            prev = rows[i - 1]
+            prev_lo = lows[i - 1]
+            prev_len = len(prev)
+            row = [inf] * (hi - lo + 1)
+            ref_ph = ref_ids[i - 1]
+
+            for j in range(lo, hi + 1):
+                if j == 0:
+                    row[0] = i
+                    continue
+                diag = prev[j - 1 - prev_lo]
+                if ref_ph == pred_ids[j - 1]:
+                    row[j - lo] = diag
+                    continue
+                k = j - prev_lo
+                up = prev[k] if k < prev_len else inf
+                left = row[j - 1 - lo] if j > lo else inf
+                row[j - lo] = 1 + min(up, left, diag)
+
+            rows.append(row)
+            lows.append(lo)
+
+        # Distance within the band is exact, otherwise widen and retry
+        if rows[m][n - lows[m]] <= band:
+            break
+        band *= 2
+
+    def cell(i, j):
+        k = j - lows[i]
+        row = rows[i]
+        return row[k] if 0 <= k < len(row) else inf
+
+    return _backtrack_alignment(ref, pred, ref_ids, pred_ids, cell)
+
 # ============================================================================
 # STEP 8: PHONEME SCORING
 # ============================================================================
 
-def score_phoneme(ref, pred):
-    """Score individual phoneme match"""
-    if ref == pred:
-        return 1.0
-    if ref == '-' or pred == '-':
-        return 0.0
-    
-    # Similar phonemes get partial credit
-    similar_groups = [
-        {'P', 'B'}, {'T', 'D'}, {'K', 'G'},
-        {'F', 'V'}, {'S', 'Z'}, {'TH', 'DH'}, {'SH', 'ZH'},
-        {'M', 'N', 'NG'}, {'IY', 'IH'}, {'EH', 'AE'},
-        {'AH', 'AX'}, {'UW', 'UH'}, {'AO', 'AA'},
-    ]
-    
-    for group in similar_groups:
-        if ref in group and pred in group:
-            return 0.5
-    
-    return 0.0
+# Similar phonemes get partial credit
+SIMILAR_PHONEME_GROUPS = [
+    {'P', 'B'}, {'T', 'D'}, {'K', 'G'},
+    {'F', 'V'}, {'S', 'Z'}, {'TH', 'DH'}, {'SH', 'ZH'},
+    {'M', 'N', 'NG'}, {'IY', 'IH'}, {'EH', 'AE'},
+    {'AH', 'AX'}, {'UW', 'UH'}, {'AO', 'AA'},
+]
+
+# (ref, pred) -> partial score for similar phonemes, source for _SIM_LUT
+_PHONEME_SCORE = {
+    (a, b): 0.5
+    for group in SIMILAR_PHONEME_GROUPS
+    for a in group
+    for b in group
+    if a != b
+}
+
+def _build_similarity_lut():
+    """Square (ref_id, pred_id) -> partial score table over the interned phoneme IDs"""
+    _phoneme_id('-')
+    for group in SIMILAR_PHONEME_GROUPS:
+        for ph in group:
+            _phoneme_id(ph)
+    lut = np.zeros((len(PHONEME2ID), len(PHONEME2ID)), dtype=np.float64)
+    for (a, b), score in _PHONEME_SCORE.items():
+        lut[PHONEME2ID[a], PHONEME2ID[b]] = score
+    return lut
+
+# IDs assigned later (unseen symbols) fall outside the table and score 0 unless equal
+_SIM_LUT = _build_similarity_lut()
 
 def score_word(alignment):
     """Calculate word score from phoneme alignment"""
     if not alignment:
         return 0.0, 0.0, []
     
-    phoneme_scores = []
-    details = []
+    count = len(alignment)
+    ref_ids = np.fromiter(map(ord, encode_phonemes([ref for ref, _, _ in alignment])), dtype=np.int32, count=count)
+    pred_ids = np.fromiter(map(ord, encode_phonemes([pred for _, pred, _ in alignment])), dtype=np.int32, count=count)
     
-    for ref, pred, is_correct in alignment:
-        score = score_phoneme(ref, pred)
-        phoneme_scores.append(score)
-        
-        details.append({
+    # One LUT gather for all pairs: 1.0 on match, 0.5 for similar phonemes, 0 otherwise
+    size = _SIM_LUT.shape[0]
+    in_lut = (ref_ids < size) & (pred_ids < size)
+    partial = _SIM_LUT[np.where(in_lut, ref_ids, 0), np.where(in_lut, pred_ids, 0)]
+    scores = np.where(ref_ids == pred_ids, 1.0, np.where(in_lut, partial, 0.0))
+    phoneme_scores = scores.tolist()
+    
+    details = [
+        {
             'reference': ref,
             'predicted': pred,
             'score': score,
             'correct': is_correct
-        })
+        }
+        for (ref, pred, is_correct), score in zip(alignment, phoneme_scores)
+    ]
     
-    word_score = np.mean(phoneme_scores) if phoneme_scores else 0.0
-    phoneme_accuracy = sum(1 for _, _, c in alignment if c) / len(alignment)
+    word_score = float(scores.mean())
+    phoneme_accuracy = sum(1 for _, _, is_correct in alignment if is_correct) / count
     
     return word_score, phoneme_accuracy, details
 
@@ -1048,13 +1637,17 @@ def score_word(alignment):
 
 def main():
     """Execute pronunciation assessment pipeline"""
+    print(f"🎯 Device: {DEVICE}")
+    print(f"📝 Reference: '{REFERENCE_TEXT}'")
+    print(f"🎵 Audio: {AUDIO_FILE}")
+    print("="*80)
     
     # STEP 1: Preprocess
     audio_data, sr = preprocess_audio(AUDIO_FILE)
     audio_duration = len(audio_data) / sr
     
     # STEP 2: WhisperX timestamps
-    words_with_times = get_word_timestamps(AUDIO_FILE)
+    words_with_times = get_word_timestamps(audio_data, sr)
     
     # STEP 3: Reference phonemes
     reference_phonemes = get_reference_phonemes(REFERENCE_TEXT)
@@ -1068,47 +1661,44 @@ def main():
     )
     
     # STEP 6: Align phonemes to words (improved method)
+    words = _normalize_words(words_with_times)
     word_predicted_phonemes, word_alignments = align_phonemes_to_words_v2(
         predicted_phonemes_full, 
         reference_phonemes,
-        words_with_times
+        words_with_times,
+        words
     )
     
     # STEP 7-8: Score each word
-    print("\n📊 STEP 7-8: Scoring words...")
+    module_logger.debug("📊 STEP 7-8: Scoring words...")
     word_results = []
+    debug = module_logger.isEnabledFor(logging.DEBUG)
     
-    for word_info in words_with_times:
-        word = word_info['word']
-        word_clean = word.strip('.,!?;:').upper()
-        confidence = word_info['confidence']
-        
-        print(f"\n  {word_clean}:")
-        
+    for word_clean, start, end, confidence in zip(
+        words.clean, np.round(words.start, 2).tolist(), np.round(words.end, 2).tolist(), words.confidence.tolist()
+    ):
         ref_phonemes = reference_phonemes.get(word_clean, [])
         pred_phonemes = word_predicted_phonemes.get(word_clean, [])
         
-        print(f"    Ref:  {' '.join(ref_phonemes)}")
-        print(f"    Pred: {' '.join(pred_phonemes)}")
-        
-        # Use pre-computed alignment if available
+        # Sentence-level alignment already covers every word that has predicted phonemes
         if word_clean in word_alignments:
             alignment = word_alignments[word_clean]
             word_score, phoneme_acc, details = score_word(alignment)
-        elif ref_phonemes and pred_phonemes:
-            alignment = align_phoneme_sequences(ref_phonemes, pred_phonemes)
-            word_score, phoneme_acc, details = score_word(alignment)
         else:
             word_score = confidence * 0.8
             phoneme_acc = confidence
             details = []
         
-        print(f"    Score: {word_score:.2f} (acc: {phoneme_acc:.2f})")
+        if debug:
+            module_logger.debug(
+                "  %s:\n    Ref:  %s\n    Pred: %s\n    Score: %.2f (acc: %.2f)",
+                word_clean, ' '.join(ref_phonemes), ' '.join(pred_phonemes), word_score, phoneme_acc
+            )
         
         word_results.append({
             'word': word_clean,
-            'start': round(word_info['start'], 2),
-            'end': round(word_info['end'], 2),
+            'start': start,
+            'end': end,
             'score': round(word_score, 2),
             'phoneme_accuracy': round(phoneme_acc, 2),
             'confidence': round(confidence, 2),
@@ -1118,7 +1708,7 @@ def main():
         })
     
     # Calculate sentence score
-    sentence_score = np.mean([w['score'] for w in word_results]) if word_results else 0.0
+    sentence_score = statistics.fmean(w['score'] for w in word_results) if word_results else 0.0
     
     if sentence_score >= 0.9:
         grade = "Excellent"
@@ -1155,7 +1745,7 @@ def main():
             'sentence_score': round(sentence_score, 2),
             'grade': grade,
             'word_count': len(word_results),
-            'avg_phoneme_accuracy': round(np.mean([w['phoneme_accuracy'] for w in word_results]), 2)
+            'avg_phoneme_accuracy': round(statistics.fmean(w['phoneme_accuracy'] for w in word_results), 2) if word_results else 0.0
         },
         'words': word_results,
         'feedback': feedback if feedback else ['Great pronunciation!']
@@ -1163,8 +1753,12 @@ def main():
     
     # Save
     output_file = 'pronunciation_result_v4.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
     
     print(f"\n✅ Saved: {output_file}")
     
@@ -1188,4 +1782,6 @@ def main():
     print("="*80)
 
 if __name__ == "__main__":
+    # Show the step-by-step pipeline logs when run as a script
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     main()
@@ -1,17 +1,20 @@
-import difflib
 from typing import List, Tuple, Dict, Any
 import time
+import atexit
 import logging
-import math
+import itertools
 import numpy as np
 from fastapi import HTTPException
-from phonemizer import phonemize
+import phonemizer
+from phonemizer.backend import EspeakBackend
 from phonemizer.separator import Separator
 import os
-from jiwer import wer
-from dtwalign import dtw_from_distance_matrix
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from .word_matching import get_best_mapped_words_dtw
-from .word_metrics import edit_distance_python as wm_edit_distance
+from .word_metrics import edit_distance as wm_edit_distance, sequence_opcodes, Levenshtein
 from models import (
     PhonemeData,
     PronunciationScore,
@@ -22,96 +25,236 @@ from models import (
 )
 
 
+logger = logging.getLogger("api_logger")
+# Request id chỉ để correlate log: prefix ngẫu nhiên theo process + bộ đếm, không cần urandom mỗi request
+_REQUEST_ID_PREFIX = os.urandom(2).hex()
+_request_counter = itertools.count()
+
+# ===== PHONEME CACHE =====
+# Cache phonemize theo đúng token (giữ hoa/thường: espeak đọc "AI", "USA" khác "ai", "usa")
+PHONEME_CACHE_MAXSIZE = 50_000
+# Câu gốc do client gửi lên: giới hạn số câu giữ lại (LRU)
+REF_CACHE_MAXSIZE = 2_048
+PHONEME_CACHE_PATH = os.getenv("PA_PHONEME_CACHE_PATH")  # None -> không lưu ra đĩa
+# File cache ghi kèm version của phonemizer; khác version -> bỏ qua file cũ
+PHONEME_CACHE_VERSION = getattr(phonemizer, "__version__", "unknown")
+_phoneme_cache: "OrderedDict[str, str]" = OrderedDict()
+_phoneme_cache_lock = threading.Lock()
+
+
+def load_phoneme_cache(path: str | None = PHONEME_CACHE_PATH) -> int:
+    """Nạp cache phonemize từ file pickle (nếu có), trả về số entry"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        payload = pickle.load(f)
+    if not isinstance(payload, dict) or payload.get("version") != PHONEME_CACHE_VERSION:
+        return 0
+    entries = payload["entries"]
+    with _phoneme_cache_lock:
+        for word, phon in list(entries.items())[-PHONEME_CACHE_MAXSIZE:]:
+            _phoneme_cache[word] = phon
+    return len(entries)
+
+
+def save_phoneme_cache(path: str | None = PHONEME_CACHE_PATH) -> None:
+    if not path:
+        return
+    with _phoneme_cache_lock:
+        entries = dict(_phoneme_cache)
+    with open(path, "wb") as f:
+        pickle.dump(
+            {"version": PHONEME_CACHE_VERSION, "entries": entries}, f, protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+
+# Dùng EspeakBackend trực tiếp: hàm phonemize() tạo (và probe) lại backend ở mỗi lần gọi.
+# Mỗi thread một backend vì wrapper espeak không thread-safe
+_SEPARATOR = Separator(phone=" ", syllable="", word="|")
+_espeak_local = threading.local()
+
+
+def _espeak_phonemize(words: List[str], njobs: int = 1) -> List[str]:
+    backend = getattr(_espeak_local, "backend", None)
+    if backend is None:
+        backend = _espeak_local.backend = EspeakBackend("en-us", with_stress=True)
+    return backend.phonemize(words, separator=_SEPARATOR, strip=True, njobs=njobs)
+
+
+# Phonemize câu gốc song song với Whisper (espeak chạy ngoài GIL)
+_phonemize_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ps-phonemize")
+
+
 class PronunciationService:
 
-    def warmup(self) -> None:
+    def __init__(self) -> None:
+        # Câu mẫu (bài tập) lặp lại rất nhiều: cache list PhonemeData của câu gốc theo nội dung câu
+        self._ref_cache: "OrderedDict[str, List[PhonemeData]]" = OrderedDict()
+        self._ref_cache_lock = threading.Lock()
+
+    def _reference_phonemes(self, sentence: str) -> List[PhonemeData]:
+        key = sentence.strip()
+        with self._ref_cache_lock:
+            cached = self._ref_cache.get(key)
+            if cached is not None:
+                self._ref_cache.move_to_end(key)
+        if cached is None:
+            words = key.split()
+            cached = [
+                PhonemeData(word=w, phoneme=p.strip()) for w, p in zip(words, self._phonemize_words(words))
+            ]
+            with self._ref_cache_lock:
+                self._ref_cache[key] = cached
+                if len(self._ref_cache) > REF_CACHE_MAXSIZE:
+                    self._ref_cache.popitem(last=False)
+        return list(cached)
+
+    def _phonemize_words(self, words: List[str]) -> List[str]:
+        """Phonemize từng từ, chỉ gọi espeak (một lần) cho các từ chưa có trong cache"""
+        unique = list(dict.fromkeys(words))
+        with _phoneme_cache_lock:
+            found = {}
+            for w in unique:
+                phon = _phoneme_cache.get(w)
+                if phon is not None:
+                    _phoneme_cache.move_to_end(w)
+                    found[w] = phon
+        misses = [w for w in unique if w not in found]
+        if misses:
+            # espeak chạy ngoài lock; chỉ giữ lock khi insert/evict
+            njobs = 1 if len(misses) < 8 else min(4, os.cpu_count() or 1)
+            phonemized = [p.strip() for p in _espeak_phonemize(misses, njobs=njobs)]
+            found.update(zip(misses, phonemized))
+            with _phoneme_cache_lock:
+                for w, p in zip(misses, phonemized):
+                    _phoneme_cache[w] = p
+                while len(_phoneme_cache) > PHONEME_CACHE_MAXSIZE:
+                    _phoneme_cache.popitem(last=False)
+        return [found[w] for w in words]
+
+    def warmup(self, sentences: List[str] | None = None) -> None:
         try:
             test_words = ["hello", "world"]
-            sep = Separator(phone=" ", syllable="", word="|")
-            _ = phonemize(
-                test_words, language="en-us", backend="espeak", with_stress=True, strip=True, separator=sep, njobs=1
-            )
+            _ = _espeak_phonemize(test_words)
             _ = get_best_mapped_words_dtw(["a"], ["a"])
+            # Nạp sẵn rapidfuzz (WER, edit distance, char-level alignment) để request đầu tiên không phải trả giá load
+            t0 = time.perf_counter()
+            _ = self.calculate_wer("a b", "a c")
+            _ = wm_edit_distance("abc", "abd")
+            _ = self._align_sequences_dtw_patched(["ab", "c"], ["ad", "c"])
+            logger.info(
+                "Alignment kernels warmed up in %.1f ms", (time.perf_counter() - t0) * 1000
+            )
+            if PHONEME_CACHE_PATH:
+                load_phoneme_cache()
+                atexit.register(save_phoneme_cache)
+            # Phonemize trước các câu bài tập để request đầu tiên cũng hit cache
+            for sentence in sentences or []:
+                self._reference_phonemes(sentence)
         except Exception:
             pass
 
     def calculate_wer(self, reference: str, hypothesis: str) -> float:
-        return wer(reference, hypothesis)
+        # Token-level edit distance in C (rapidfuzz hashes the tokens); jiwer chỉ được
+        # import khi cần (empty reference -> ValueError như cũ, hoặc thiếu rapidfuzz)
+        ref_tokens = reference.split()
+        if Levenshtein is None or not ref_tokens:
+            from jiwer import wer
+            return wer(reference, hypothesis)
+        return Levenshtein.distance(ref_tokens, hypothesis.split()) / len(ref_tokens)
 
     def evaluate_pronunciation_phonemes_aligned(
         self, 
         reference_phonemes: List[PhonemeData], 
         learner_phonemes: List[PhonemeData],
         learner_words_with_ts: List[Dict[str, Any]]
-    ) -> Tuple[PronunciationScore, List[dict], float, List[WordAccuracyData]]:
+    ) -> Tuple[PronunciationScore, List[dict], float, List[WordAccuracyData], List[str], List[str]]:
         ref_words = [p.word for p in reference_phonemes]
         est_words = [p.word for p in learner_phonemes]
 
         mapped_words, mapped_indices = get_best_mapped_words_dtw(est_words, ref_words)
         
-        word_accuracy = []
+        n_words = len(reference_phonemes)
         phoneme_errors = []
-        total_phonemes = 0
-        total_mismatches = 0
+        # Đọc phoneme một lần, bỏ khoảng trắng một lần cho cả hai phía thay vì trong vòng lặp
+        ref_raw = [p.phoneme for p in reference_phonemes]
+        learner_raw = [p.phoneme for p in learner_phonemes]
+        ref_seqs = [ph.replace(" ", "") for ph in ref_raw]
+        learner_seqs = [ph.replace(" ", "") for ph in learner_raw]
+        # Token list (bỏ phoneme rỗng) cho bước alignment hiển thị, trả về cho caller dùng lại
+        ref_tokens = [t for t in ((ph or "").strip() for ph in ref_raw) if t]
+        learner_tokens = [t for t in ((ph or "").strip() for ph in learner_raw) if t]
+        n_mapped = len(mapped_indices)
+        n_ts = len(learner_words_with_ts)
+        # Cột theo từ: độ dài phoneme gốc, edit distance, từ có được map không,
+        # thời lượng phát âm của learner (nan nếu không có timestamp)
+        ref_lens = np.fromiter(map(len, ref_seqs), dtype=np.int32, count=n_words)
+        learner_idx = [mapped_indices[i] if i < n_mapped else -1 for i in range(n_words)]
+        mapped = np.fromiter((li >= 0 for li in learner_idx), dtype=bool, count=n_words)
+        est_seqs = [learner_seqs[li] if li >= 0 else "" for li in learner_idx]
+        # Tính điểm phát âm (phoneme accuracy): edit distance cả câu trong một lượt,
+        # từ không được map không tính lỗi. Điểm bị chặn ở 0 khi dist >= len(ref) nên
+        # cho rapidfuzz dừng sớm ở ngưỡng đó
+        dists = np.fromiter(
+            map(wm_edit_distance, ref_seqs, est_seqs, ref_lens.tolist()), dtype=np.int32, count=n_words
+        )
+        dists[~mapped] = 0
+
+        # Thời lượng để tính điểm nhịp điệu (rhythm score): mỗi từ của learner tính một lần,
+        # thêm một ô nan ở cuối để index -1 / ngoài timestamp gather ra nan
+        ts_durations = np.array(
+            [w['end'] - w['start'] if 'start' in w and 'end' in w else np.nan for w in learner_words_with_ts]
+            + [np.nan],
+            dtype=np.float64,
+        )
+        gather_idx = np.array(learner_idx, dtype=np.int64)
+        gather_idx[(gather_idx < 0) | (gather_idx >= n_ts)] = n_ts
+        durations = ts_durations[gather_idx]
+
+        for i in np.flatnonzero(dists).tolist():
+            phoneme_errors.append({
+                "type": "pronunciation",
+                "expected_phoneme": ref_raw[i],
+                "actual_phoneme": learner_raw[learner_idx[i]] if est_seqs[i] else "",
+            })
+
+        # Điểm phát âm: (len - dist) / len, 0 cho từ không được map
+        pron_arr = np.where(
+            mapped, np.maximum(0.0, (ref_lens - dists) / np.maximum(ref_lens, 1)) * 100, 0.0
+        )
 
-        for i, ref in enumerate(reference_phonemes):
-            ref_seq = ref.phoneme.replace(" ", "")
-            total_phonemes += len(ref_seq) or 1
-            
-            phon_est = ""
-            pronunciation_score = 0.0
-            rhythm_score = 0.0
-
-            if i < len(mapped_indices) and mapped_indices[i] >= 0:
-                learner_word_index = mapped_indices[i]
-                phon_est = learner_phonemes[learner_word_index].phoneme.replace(" ", "")
-                
-                # Tính điểm phát âm (phoneme accuracy)
-                dist = wm_edit_distance(ref_seq, phon_est)
-                total_mismatches += dist
-                pronunciation_score = max(0.0, (len(ref_seq) - dist) / max(len(ref_seq), 1)) * 100
-
-                # Tính điểm nhịp điệu (rhythm score)
-                if learner_word_index < len(learner_words_with_ts):
-                    learner_word_info = learner_words_with_ts[learner_word_index]
-                    if 'start' in learner_word_info and 'end' in learner_word_info:
-                        learner_duration = learner_word_info['end'] - learner_word_info['start']
-                        
-                        # Ước tính thời gian chuẩn dựa trên số lượng âm vị
-                        ref_phoneme_count = len(ref_seq)
-                        standard_duration = 0.08 * ref_phoneme_count + 0.15 # Heuristic: 80ms/phoneme + 150ms base
-                        
-                        if standard_duration > 0:
-                            ratio = learner_duration / standard_duration
-                            # Dùng hàm Gaussian để tính điểm, điểm cao nhất khi ratio=1
-                            # sigma=0.4 -> cho phép sai lệch khoảng 40%
-                            sigma = 0.4 
-                            rhythm_score = math.exp(-0.5 * ((ratio - 1) / sigma) ** 2) * 100
-
-                if dist > 0:
-                    phoneme_errors.append({
-                        "type": "pronunciation",
-                        "expected_phoneme": ref.phoneme,
-                        "actual_phoneme": learner_phonemes[learner_word_index].phoneme if phon_est else "",
-                    })
-            
-            # Kết hợp điểm
-            # Trọng số: 70% cho phát âm, 30% cho nhịp điệu
-            final_accuracy = pronunciation_score * 0.7 + rhythm_score * 0.3
-
-            word_accuracy.append(
-                WordAccuracyData(
-                    word=ref.word, 
-                    accuracy_percentage=round(final_accuracy, 1),
-                    pronunciation_score=round(pronunciation_score, 1),
-                    rhythm_score=round(rhythm_score, 1)
-                )
+        # Điểm nhịp điệu: ước tính thời gian chuẩn dựa trên số lượng âm vị
+        # Heuristic: 80ms/phoneme + 150ms base
+        standard_durations = 0.08 * ref_lens + 0.15
+        ratios = durations / standard_durations
+        # Dùng hàm Gaussian để tính điểm, điểm cao nhất khi ratio=1
+        # sigma=0.4 -> cho phép sai lệch khoảng 40%
+        sigma = 0.4
+        rhythm_arr = np.nan_to_num(np.exp(-0.5 * ((ratios - 1) / sigma) ** 2) * 100, nan=0.0)
+
+        # Kết hợp điểm
+        # Trọng số: 70% cho phát âm, 30% cho nhịp điệu
+        final_arr = pron_arr * 0.7 + rhythm_arr * 0.3
+
+        final_rounded = np.round(final_arr, 1)
+        pron_rounded = np.round(pron_arr, 1)
+        word_accuracy = [
+            WordAccuracyData(
+                word=ref.word,
+                accuracy_percentage=acc,
+                pronunciation_score=pron,
+                rhythm_score=rhythm
+            )
+            for ref, acc, pron, rhythm in zip(
+                reference_phonemes,
+                final_rounded.tolist(),
+                pron_rounded.tolist(),
+                np.round(rhythm_arr, 1).tolist(),
             )
+        ]
 
-        ref_seq_all = " ".join([p.phoneme for p in reference_phonemes])
-        est_seq_all = " ".join(
-            [learner_phonemes[mapped_indices[i]].phoneme for i in range(len(ref_words)) if mapped_indices[i] >= 0]
-        )
+        ref_seq_all = " ".join(ref_raw)
+        est_seq_all = " ".join([learner_raw[li] for li in learner_idx if li >= 0])
         wer_score = self.calculate_wer(ref_seq_all, est_seq_all)
 
         # Tính điểm tổng thể bằng trung bình cộng của điểm từng từ
@@ -119,12 +262,12 @@ class PronunciationService:
             overall_accuracy = 0.0
             overall_pronunciation = 0.0
         else:
-            total_accuracy_sum = sum(wa.accuracy_percentage for wa in word_accuracy)
-            overall_accuracy = round(total_accuracy_sum / len(word_accuracy), 1)
+            # Trung bình trên các cột đã làm tròn (giống giá trị trong word_accuracy),
+            # không cần duyệt lại list model
+            overall_accuracy = round(float(final_rounded.mean()), 1)
 
             # Bạn cũng có thể tính điểm phát âm tổng thể riêng nếu muốn
-            total_pron_sum = sum(wa.pronunciation_score for wa in word_accuracy)
-            overall_pronunciation = round(total_pron_sum / len(word_accuracy), 1)
+            overall_pronunciation = round(float(pron_rounded.mean()), 1)
 
         scores = PronunciationScore(
             # Sử dụng điểm phát âm trung bình cho 'pronunciation'
@@ -136,7 +279,7 @@ class PronunciationService:
             overall=overall_accuracy
         )
 
-        return scores, phoneme_errors, wer_score, word_accuracy
+        return scores, phoneme_errors, wer_score, word_accuracy, ref_tokens, learner_tokens
 
     def _align_sequences_dtw_patched(
         self, ref_seq: List[str], learner_seq: List[str]
@@ -148,12 +291,19 @@ class PronunciationService:
             return [self._build_alignment_item(None, l, False) for l in learner_seq]
         if not learner_seq:
             return [self._build_alignment_item(r, None, False) for r in ref_seq]
+        if ref_seq == learner_seq:
+            # Đọc đúng hoàn toàn: không cần tính opcodes
+            return [self._build_alignment_item(r, r, True) for r in ref_seq]
 
         final_alignment: List[AlignmentItem] = []
-        
-        sm = difflib.SequenceMatcher(None, ref_seq, learner_seq, autojunk=False)
-        
-        for tag, i1, i2, j1, j2 in sm.get_opcodes():
+
+        # Mã hoá mỗi token phoneme thành một ký tự (id nhỏ) -> rapidfuzz so sánh số nguyên
+        # trên str thay vì hash/so sánh từng chuỗi token
+        vocab: Dict[str, int] = {}
+        ref_enc = "".join(chr(vocab.setdefault(t, len(vocab))) for t in ref_seq)
+        learner_enc = "".join(chr(vocab.setdefault(t, len(vocab))) for t in learner_seq)
+
+        for tag, i1, i2, j1, j2 in sequence_opcodes(ref_enc, learner_enc):
             if tag == 'equal':  # Các từ khớp hoàn toàn
                 for i in range(i2 - i1):
                     ref_val = ref_seq[i1 + i]
@@ -189,7 +339,20 @@ class PronunciationService:
         sub_alignment: List[SubAlignment] = []
         if not is_match:
             ref_chars, learner_chars = list(ref_val or ""), list(learner_val or "")
-            sub_alignment = self._align_chars(ref_chars, learner_chars)
+            if len(ref_chars) == 1 and len(learner_chars) == 1:
+                # 1-1 ký tự: không cần DTW
+                sub_alignment = [SubAlignment(
+                    ref=ref_chars[0], learner=learner_chars[0], is_match=ref_chars[0] == learner_chars[0]
+                )]
+            elif (
+                ref_chars and learner_chars
+                and abs(len(ref_chars) - len(learner_chars)) <= 1
+                and wm_edit_distance(ref_val, learner_val, score_cutoff=1) == 1
+            ):
+                # Chỉ khác đúng một ký tự (thay/thêm/bớt) -> alignment hiển nhiên, bỏ qua DTW
+                sub_alignment = self._single_edit_sub_alignment(ref_chars, learner_chars)
+            else:
+                sub_alignment = self._align_chars(ref_chars, learner_chars)
         return AlignmentItem(
             ref=ref_val,
             learner=learner_val,
@@ -197,10 +360,32 @@ class PronunciationService:
             sub_alignment=sub_alignment,
         )
 
+    @staticmethod
+    def _single_edit_sub_alignment(
+        ref_chars: List[str], learner_chars: List[str]
+    ) -> List[SubAlignment]:
+        """Alignment cho hai chuỗi có edit distance đúng bằng 1"""
+        k = 0
+        n = min(len(ref_chars), len(learner_chars))
+        while k < n and ref_chars[k] == learner_chars[k]:
+            k += 1
+        aligned = [SubAlignment(ref=c, learner=c, is_match=True) for c in ref_chars[:k]]
+        if len(ref_chars) == len(learner_chars):
+            aligned.append(SubAlignment(ref=ref_chars[k], learner=learner_chars[k], is_match=False))
+            tail = ref_chars[k + 1:]
+        elif len(ref_chars) > len(learner_chars):
+            aligned.append(SubAlignment(ref=ref_chars[k], learner=None, is_match=False))
+            tail = ref_chars[k + 1:]
+        else:
+            aligned.append(SubAlignment(ref=None, learner=learner_chars[k], is_match=False))
+            tail = learner_chars[k + 1:]
+        aligned += [SubAlignment(ref=c, learner=c, is_match=True) for c in tail]
+        return aligned
+
     def _align_chars(
         self, ref_chars: List[str], learner_chars: List[str]
     ) -> List[SubAlignment]:
-        """Align characters using DTW algorithm"""
+        """Align characters using a Levenshtein edit script"""
         if not ref_chars and not learner_chars:
             return []
         if not ref_chars:
@@ -212,55 +397,35 @@ class PronunciationService:
                 SubAlignment(ref=r, learner=None, is_match=False) for r in ref_chars
             ]
 
-        # Tạo distance matrix (learner x ref)
-        m, n = len(learner_chars), len(ref_chars)
-        distance_matrix = np.zeros((m, n))
-        for i in range(m):
-            for j in range(n):
-                # Distance = 0 nếu match, 1 nếu mismatch
-                distance_matrix[i, j] = 0.0 if learner_chars[i] == ref_chars[j] else 1.0
-
-        # Chạy DTW
-        dtw_result = dtw_from_distance_matrix(distance_matrix)
-
-        # Parse alignment path
+        # Edit script ký tự (rapidfuzz, bit-parallel) thay cho DTW trên ma trận 0/1:
+        # không cần dựng ma trận, và không lặp lại ký tự như đường đi DTW
         aligned: List[SubAlignment] = []
-        path = (
-            dtw_result.path
-        )  # shape: [path_length, 2], columns: [learner_idx, ref_idx]
-
-        for i in range(len(path)):
-            learner_idx, ref_idx = path[i]
-
-            # Kiểm tra nếu là valid index
-            if learner_idx < len(learner_chars) and ref_idx < len(ref_chars):
-                # Match/mismatch
-                ref_val = ref_chars[ref_idx]
-                learner_val = learner_chars[learner_idx]
-                is_match = ref_val == learner_val
-                aligned.append(
-                    SubAlignment(ref=ref_val, learner=learner_val, is_match=is_match)
-                )
-            elif learner_idx >= len(learner_chars) and ref_idx < len(ref_chars):
-                # Deletion (missing in learner)
-                aligned.append(
-                    SubAlignment(ref=ref_chars[ref_idx], learner=None, is_match=False)
-                )
-            elif learner_idx < len(learner_chars) and ref_idx >= len(ref_chars):
-                # Insertion (extra in learner)
-                aligned.append(
-                    SubAlignment(
-                        ref=None, learner=learner_chars[learner_idx], is_match=False
-                    )
-                )
+        for tag, i1, i2, j1, j2 in sequence_opcodes("".join(ref_chars), "".join(learner_chars)):
+            if tag == 'equal':
+                aligned += [SubAlignment(ref=c, learner=c, is_match=True) for c in ref_chars[i1:i2]]
+            elif tag == 'delete':  # Thiếu trong learner
+                aligned += [SubAlignment(ref=c, learner=None, is_match=False) for c in ref_chars[i1:i2]]
+            elif tag == 'insert':  # Thừa trong learner
+                aligned += [SubAlignment(ref=None, learner=c, is_match=False) for c in learner_chars[j1:j2]]
+            elif tag == 'replace':
+                len_ref_sub = i2 - i1
+                len_learner_sub = j2 - j1
+                for k in range(max(len_ref_sub, len_learner_sub)):
+                    aligned.append(SubAlignment(
+                        ref=ref_chars[i1 + k] if k < len_ref_sub else None,
+                        learner=learner_chars[j1 + k] if k < len_learner_sub else None,
+                        is_match=False,
+                    ))
 
         return aligned
 
     def process_phonetic_evaluation(self, request, whisper_service, llm_service):
-        logger = logging.getLogger("api_logger")
-        request_id = os.urandom(4).hex()
+        request_id = f"{_REQUEST_ID_PREFIX}{next(_request_counter) & 0xFFFF:04x}"
         logger.info(f"[{request_id}] Received request for: '{request.sentence}'")
         try:
+            # Câu gốc không phụ thuộc vào kết quả Whisper -> phonemize trong lúc chờ transcribe
+            ref_future = _phonemize_executor.submit(self._reference_phonemes, request.sentence)
+
             t0 = time.perf_counter()
             transcribed_text, confidence, learner_words_with_ts = whisper_service.transcribe_audio_base64(request.audio_base64)
             t1 = time.perf_counter()
@@ -268,21 +433,14 @@ class PronunciationService:
             if transcribed_text is None:
                 raise HTTPException(status_code=500, detail="Could not transcribe audio.")
 
-            original_words = request.sentence.split()
-            sep = Separator(phone=" ", syllable="", word="|")
-            ref_phonemes_batched = phonemize(
-                original_words, language="en-us", backend="espeak", with_stress=True, strip=True, separator=sep, njobs=1
-            )
-            reference_phonemes_list = [PhonemeData(word=w, phoneme=p.strip()) for w, p in zip(original_words, ref_phonemes_batched)]
-
             learner_words = transcribed_text.split()
-            learner_phonemes_batched = phonemize(
-                learner_words, language="en-us", backend="espeak", with_stress=True, strip=True, separator=sep, njobs=1
-            )
+            # Từ của learner: chỉ gọi espeak cho các từ chưa có trong cache
+            learner_phonemes_batched = self._phonemize_words(learner_words)
+            reference_phonemes_list = ref_future.result()
             learner_phonemes_list = [PhonemeData(word=w, phoneme=p.strip()) for w, p in zip(learner_words, learner_phonemes_batched)]
             
             t0 = time.perf_counter()
-            scores, phoneme_errors, wer_score, word_accuracy = self.evaluate_pronunciation_phonemes_aligned(
+            scores, phoneme_errors, wer_score, word_accuracy, ref_seq, learner_seq = self.evaluate_pronunciation_phonemes_aligned(
                 reference_phonemes=reference_phonemes_list,
                 learner_phonemes=learner_phonemes_list,
                 learner_words_with_ts=learner_words_with_ts
@@ -290,8 +448,6 @@ class PronunciationService:
             t1 = time.perf_counter()
             logger.info(f"[{request_id}] Pronunciation evaluated in {(t1-t0)*1000:.1f} ms")
 
-            ref_seq = [(p.phoneme or "").strip() for p in reference_phonemes_list if (p.phoneme or "").strip()]
-            learner_seq = [(p.phoneme or "").strip() for p in learner_phonemes_list if (p.phoneme or "").strip()]
             phoneme_alignment = self._align_sequences_dtw_patched(ref_seq, learner_seq)
 
             feedback = "Default feedback."
@@ -17,24 +17,17 @@ class SentencesService:
         if not os.path.exists(self.csv_path):
             return []
 
-        rows: List[Dict[str, str]] = []
-        with open(self.csv_path, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
+        with open(self.csv_path, "r", encoding="utf-8", newline="") as f:
+            # skipinitialspace: quote sau dấu phẩy + khoảng trắng vẫn được csv bỏ đi
+            reader = csv.reader(f, skipinitialspace=True)
             _ = next(reader, None)  # skip header
-            for r in reader:
-                if not r or len(r) < 3:
-                    continue
-                topic, scenario, sentence = r[0], r[1], r[2]
-                topic = topic.strip().strip('"')
-                scenario = scenario.strip().strip('"')
-                sentence = sentence.strip().strip('"')
-                if not topic or not scenario or not sentence:
-                    continue
-                rows.append({
-                    "topic": topic,
-                    "scenario": scenario,
-                    "sentence": sentence,
-                })
+            rows: List[Dict[str, str]] = [
+                {"topic": topic, "scenario": scenario, "sentence": sentence}
+                for topic, scenario, sentence in (
+                    (r[0].strip(), r[1].strip(), r[2].strip()) for r in reader if len(r) >= 3
+                )
+                if topic and scenario and sentence
+            ]
 
         return rows
 
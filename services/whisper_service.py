@@ -1,35 +1,88 @@
-import whisper
+import torch
+from faster_whisper import WhisperModel, decode_audio
 import base64
+import hashlib
 import io
+import threading
+from collections import OrderedDict
 import numpy as np
 import soundfile as sf
-from pydub import AudioSegment
 from typing import Tuple, List, Dict, Any
 import soxr
 
+try:
+    from numba import njit
+except ImportError:  # _enhance_audio dùng NumPy
+    njit = None
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _enhance_kernel(x):
+        """Bỏ DC offset + chuẩn hóa peak về 0.95: một lượt lấy sum/min/max, một lượt ghi output"""
+        n = x.shape[0]
+        out = np.empty(n, dtype=np.float32)
+        if n == 0:
+            return out
+        total = 0.0
+        lo = x[0]
+        hi = x[0]
+        for i in range(n):
+            v = x[i]
+            total += v
+            if v < lo:
+                lo = v
+            if v > hi:
+                hi = v
+        mean = total / n
+        # max |x - mean| = max(hi - mean, mean - lo)
+        max_val = max(hi - mean, mean - lo)
+        scale = 0.95 / max_val if max_val > 0 else 1.0
+        for i in range(n):
+            out[i] = (x[i] - mean) * scale
+        return out
+else:
+    _enhance_kernel = None
+
+
+# Số kết quả transcribe giữ lại theo hash của audio (retry / gửi lại cùng một file)
+TRANSCRIPTION_CACHE_SIZE = 256
+
+
 class WhisperService:
     """
     Whisper-based speech-to-text service for pronunciation evaluation
     """
     
-    def __init__(self, model_size: str = "tiny"):
-        self.model = whisper.load_model(model_size)
+    def __init__(self, model_size: str = "tiny", device: str | None = None):
+        self._cache: "OrderedDict[bytes, Tuple[str, float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        # CTranslate2 backend: weight INT8, activation FP16 trên GPU / INT8 trên CPU
+        self.compute_type = "int8_float16" if self.device == "cuda" else "int8"
+        self.model = WhisperModel(model_size, device=self.device, compute_type=self.compute_type)
         self.model_size = model_size
     
     def warmup(self) -> None:
         """Run a tiny, fast transcription to warm caches and kernels."""
+        # 0.2s of silence at 16kHz
+        sr = 16000
+        silence = np.zeros(int(0.2 * sr), dtype=np.float32)
+        try:
+            # Compile kernel numba trước request đầu tiên, độc lập với warmup của model
+            _ = self._enhance_audio(np.zeros(1024, dtype=np.float32))
+        except Exception:
+            pass
         try:
-            # 0.2s of silence at 16kHz
-            sr = 16000
-            silence = np.zeros(int(0.2 * sr), dtype=np.float32)
-            _ = self.model.transcribe(
+            segments, _ = self.model.transcribe(
                 silence,
                 language="en",
                 task="transcribe",
-                fp16=False,
+                beam_size=1,
                 temperature=0.0,
                 condition_on_previous_text=False
             )
+            _ = list(segments)  # segments là generator: phải duyệt mới thực sự decode
         except Exception:
             # Warmup is best-effort; ignore failures
             pass
@@ -46,46 +99,77 @@ class WhisperService:
         """
         try:
             audio_bytes = base64.b64decode(audio_base64)
+        except Exception as e:
+            print(f"Whisper transcription error: {e}")
+            return "", 0.0, []
+        return self.transcribe_audio_bytes(audio_bytes)
+
+    def transcribe_audio_bytes(self, audio_bytes: bytes) -> Tuple[str, float, List[Dict[str, Any]]]:
+        """
+        Transcribe raw audio file bytes (e.g. from an upload), skipping the base64 round-trip.
+        
+        Args:
+            audio_bytes: Encoded audio file content (wav/flac/ogg/mp3/webm...)
             
-            try:
-                audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-                wav_buffer = io.BytesIO()
-                audio_segment.export(wav_buffer, format="wav")
-                wav_buffer.seek(0)
-                audio_data, sample_rate = sf.read(wav_buffer)
-            except Exception:
-                audio_data, sample_rate = sf.read(io.BytesIO(audio_bytes))
+        Returns:
+            Tuple of (transcribed_text, confidence_score, word_segments)
+        """
+        try:
+            cache_key = hashlib.blake2b(audio_bytes, digest_size=16).digest()
+            with self._cache_lock:
+                cached = self._cache.get(cache_key)
+                if cached is not None:
+                    self._cache.move_to_end(cache_key)
+            if cached is not None:
+                text, confidence, word_segments = cached
+                return text, confidence, [dict(w) for w in word_segments]
             
-            if len(audio_data.shape) > 1:
-                audio_data = audio_data.mean(axis=1, dtype=np.float32)
-            else:
-                audio_data = audio_data.astype(np.float32, copy=False)
-
             target_sr = 16000
-            if sample_rate != target_sr:
-                audio_data = soxr.resample(audio_data, sample_rate, target_sr)
+            try:
+                # WAV/FLAC/OGG: decode thẳng ra float32, không qua ffmpeg
+                audio_data, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype='float32')
+                if audio_data.ndim > 1:
+                    audio_data = audio_data.mean(axis=1, dtype=np.float32)
+                if sample_rate != target_sr:
+                    audio_data = soxr.resample(audio_data, sample_rate, target_sr)
+            except Exception:
+                # mp3/webm/...: PyAV decode + resample thẳng ra float32 mono 16 kHz trong một lượt
+                # (không export WAV trung gian qua pydub)
+                audio_data = decode_audio(io.BytesIO(audio_bytes), sampling_rate=target_sr)
             
             audio_data = self._enhance_audio(audio_data)
             
-            result = self.model.transcribe(
+            segments, _ = self.model.transcribe(
                 audio_data,
                 language="en",
                 task="transcribe",
-                fp16=False,
+                beam_size=1,
                 condition_on_previous_text=False,
                 temperature=0.0,
+                vad_filter=True,
                 word_timestamps=True # Bật tính năng lấy thời gian của từng từ
             )
-            
-            transcribed_text = result["text"].strip()
-            confidence = self._calculate_confidence(result.get("segments", []))
-            
-            # Trích xuất thông tin từng từ (bao gồm start, end)
+
+            # Trích xuất text và thông tin từng từ (bao gồm start, end) trong một lượt duyệt segments
+            texts = []
             word_segments = []
-            if "segments" in result:
-                for segment in result["segments"]:
-                    if "words" in segment:
-                        word_segments.extend(segment["words"])
+            for segment in segments:
+                texts.append(segment.text)
+                for word in segment.words or []:
+                    word_segments.append({
+                        "word": word.word,
+                        "start": word.start,
+                        "end": word.end,
+                        "probability": word.probability,
+                    })
+
+            transcribed_text = "".join(texts).strip()
+            confidence = self._calculate_confidence(word_segments)
+
+            with self._cache_lock:
+                self._cache[cache_key] = (transcribed_text, confidence, [dict(w) for w in word_segments])
+                if len(self._cache) > TRANSCRIPTION_CACHE_SIZE:
+                    self._cache.popitem(last=False)
 
             return transcribed_text, confidence, word_segments
             
@@ -94,31 +178,24 @@ class WhisperService:
             return "", 0.0, []
 
     def _enhance_audio(self, audio_data: np.ndarray) -> np.ndarray:
-        audio_data = audio_data.astype(np.float32, copy=False)
-        audio_data = audio_data - np.mean(audio_data, dtype=np.float32)
-        rms = np.sqrt(np.mean((audio_data**2), dtype=np.float32))
-        if rms < 0.05:
-            boost_factor = 0.1 / (rms + 1e-8)
-            boost_factor = min(boost_factor, 10.0)
-            audio_data = audio_data * boost_factor
-        max_val = np.max(np.abs(audio_data))
-        if max_val > 0:
-            audio_data = audio_data / max_val * 0.95
-        return audio_data.astype(np.float32, copy=False)
+        if _enhance_kernel is not None:
+            return _enhance_kernel(np.ascontiguousarray(audio_data, dtype=np.float32))
+        # Bỏ DC offset (bản copy duy nhất), sau đó chuẩn hóa peak in place.
+        # RMS boost cho audio nhỏ bị peak-normalize triệt tiêu, nên chỉ còn một phép nhân.
+        audio_data = np.subtract(audio_data, np.mean(audio_data, dtype=np.float32), dtype=np.float32)
+        if audio_data.size:
+            max_val = max(float(audio_data.max()), -float(audio_data.min()))
+            if max_val > 0:
+                np.multiply(audio_data, 0.95 / max_val, out=audio_data)
+        return audio_data
     
-    def _calculate_confidence(self, segments: list) -> float:
-        if not segments:
+    def _calculate_confidence(self, word_segments: list) -> float:
+        if not word_segments:
             return 0.8
-        
-        confidences = [word.get("probability", 0.8) for segment in segments if "words" in segment for word in segment["words"]]
-        
-        if not confidences:
-            # Fallback if word probabilities are not available
-            logprobs = [s.get("avg_logprob", -1.0) for s in segments]
-            confidences = [max(0.1, min(1.0, np.exp(lp + 1.0))) for lp in logprobs]
-
-        avg_confidence = np.mean(confidences) if confidences else 0.8
+        probs = np.fromiter((w["probability"] for w in word_segments), dtype=np.float32, count=len(word_segments))
+        avg_confidence = float(probs.mean())
         return max(0.1, min(1.0, avg_confidence))
     
     def get_model_info(self) -> dict:
-        return {"model_size": self.model_size, "status": "loaded", "language": "en"}
+        return {"model_size": self.model_size, "status": "loaded", "language": "en", "device": self.device,
+                "compute_type": self.compute_type}
@@ -1,9 +1,19 @@
 from . import word_metrics
 import numpy as np
 from string import punctuation
-from dtwalign import dtw_from_distance_matrix
 import time
 from typing import List, Tuple
+
+try:
+    from rapidfuzz.process import cdist
+    from rapidfuzz.distance import Levenshtein
+except ImportError:
+    cdist = None
+
+try:
+    from numba import njit
+except ImportError:  # kernel DTW chạy bằng Python thuần
+    njit = None
 #from ortools.sat.python import cp_model
 
 offset_blank = 1
@@ -16,10 +26,15 @@ def get_word_distance_matrix(words_estimated: list, words_real: list) -> np.ndar
 
     word_distance_matrix = np.zeros(
         (number_of_estimated_words+offset_blank, number_of_real_words))
-    for idx_estimated in range(number_of_estimated_words):
-        for idx_real in range(number_of_real_words):
-            word_distance_matrix[idx_estimated, idx_real] = word_metrics.edit_distance_python(
-                words_estimated[idx_estimated], words_real[idx_real])
+    if cdist is not None and number_of_estimated_words and number_of_real_words:
+        # Cả ma trận Levenshtein tính trong C++ (rapidfuzz)
+        word_distance_matrix[:number_of_estimated_words] = cdist(
+            words_estimated, words_real, scorer=Levenshtein.distance, dtype=np.int32)
+    else:
+        for idx_estimated in range(number_of_estimated_words):
+            for idx_real in range(number_of_real_words):
+                word_distance_matrix[idx_estimated, idx_real] = word_metrics.edit_distance_python(
+                    words_estimated[idx_estimated], words_real[idx_real])
 
     if offset_blank == 1:
         for idx_real in range(number_of_real_words):
@@ -27,13 +42,69 @@ def get_word_distance_matrix(words_estimated: list, words_real: list) -> np.ndar
                                 idx_real] = len(words_real[idx_real])
     return word_distance_matrix
 
+def _dtw_path(X):
+    """DTW (step pattern symmetric2, không window) trên ma trận khoảng cách X,
+    trả về warping path (k, 2) giống dtwalign.dtw_from_distance_matrix(X).path"""
+    m, n = X.shape
+    D = np.full((m, n), np.inf)
+    D[0, 0] = X[0, 0]
+    for i in range(m):
+        for j in range(n):
+            if i == 0 and j == 0:
+                continue
+            best = np.inf
+            if i > 0:
+                best = min(best, D[i - 1, j] + X[i, j])
+                if j > 0:
+                    best = min(best, D[i - 1, j - 1] + 2.0 * X[i, j])
+            if j > 0:
+                best = min(best, D[i, j - 1] + X[i, j])
+            D[i, j] = best
+
+    # Backtrack: ưu tiên up, diag, left khi bằng nhau (argmin lấy phần tử đầu tiên)
+    path = np.empty((m + n, 2), dtype=np.int64)
+    i, j = m - 1, n - 1
+    path[0, 0] = i
+    path[0, 1] = j
+    k = 1
+    while i > 0 or j > 0:
+        up = D[i - 1, j] if i > 0 else np.inf
+        diag = D[i - 1, j - 1] if i > 0 and j > 0 else np.inf
+        left = D[i, j - 1] if j > 0 else np.inf
+        if up == np.inf and diag == np.inf and left == np.inf:
+            break
+        if up <= diag and up <= left:
+            i -= 1
+        elif diag <= left:
+            i -= 1
+            j -= 1
+        else:
+            j -= 1
+        path[k, 0] = i
+        path[k, 1] = j
+        k += 1
+    return path[:k][::-1]
+
+
+if njit is not None:
+    _dtw_path = njit(cache=True)(_dtw_path)
+
+
 def get_best_mapped_words_dtw(words_estimated: list, words_real: list): 
     word_distance_matrix = get_word_distance_matrix(words_estimated, words_real) 
-    dtw_result = dtw_from_distance_matrix(word_distance_matrix) 
-    real_indices = dtw_result.path[:-1, 1] 
-    estimated_indices = dtw_result.path[:-1, 0] 
+    path = _dtw_path(word_distance_matrix)
+    real_indices = path[:-1, 1] 
+    estimated_indices = path[:-1, 0] 
     mapped_words = ['-'] * len(words_real) 
     mapped_words_indices = [-1] * len(words_real) 
+    # Khoảng cách (không phân biệt hoa thường) để chọn giữa nhiều candidate: dùng lại
+    # ma trận DTW nếu lowercase không đổi gì, nếu không thì tính một lần khi cần
+    words_estimated_lower = [w.lower() for w in words_estimated]
+    words_real_lower = [w.lower() for w in words_real]
+    if words_estimated_lower == list(words_estimated) and words_real_lower == list(words_real):
+        lower_distance_matrix = word_distance_matrix
+    else:
+        lower_distance_matrix = None
     # Track các est_idx đã được gán để tránh assign nhiều lần 
     est_idx_assigned = set() # Gom nhóm theo real_idx 
     real_to_est_map = {} 
@@ -50,13 +121,11 @@ def get_best_mapped_words_dtw(words_estimated: list, words_real: list):
             if len(available_candidates) == 1: 
                 best_est_idx = available_candidates[0] 
             else: 
-                best_error = float('inf') 
-                best_est_idx = available_candidates[0] 
-                for est_idx in available_candidates: 
-                    error = word_metrics.edit_distance_python(words_estimated[est_idx].lower(), words_real[real_idx].lower()) 
-                    if error < best_error: 
-                        best_error = error 
-                        best_est_idx = est_idx 
+                if lower_distance_matrix is None:
+                    lower_distance_matrix = get_word_distance_matrix(words_estimated_lower, words_real_lower)
+                # argmin lấy candidate đầu tiên khi bằng nhau, giống vòng lặp so sánh '<' trước đây
+                candidate_array = np.asarray(available_candidates)
+                best_est_idx = int(candidate_array[np.argmin(lower_distance_matrix[candidate_array, real_idx])])
             mapped_words[real_idx] = words_estimated[best_est_idx] 
             mapped_words_indices[real_idx] = best_est_idx 
             est_idx_assigned.add(best_est_idx) 
@@ -1,5 +1,25 @@
+import difflib
 import numpy as np
 
+try:
+    from rapidfuzz.distance import Levenshtein
+except ImportError:
+    Levenshtein = None
+
+# (tag, i1, i2, j1, j2) edit script between two token sequences, difflib-compatible tags.
+# rapidfuzz (C++) gives a minimal Levenshtein script; difflib is the fallback
+def sequence_opcodes(a, b):
+    if Levenshtein is not None:
+        return [tuple(op) for op in Levenshtein.opcodes(a, b)]
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+# Levenshtein distance (unit costs); rapidfuzz C++ khi có, fallback sang bản pure python.
+# score_cutoff: rapidfuzz dừng sớm và trả về score_cutoff + 1 khi distance vượt ngưỡng
+def edit_distance(a, b, score_cutoff=None):
+    if Levenshtein is not None:
+        return Levenshtein.distance(a, b, score_cutoff=score_cutoff)
+    return edit_distance_python(a, b)
+
 # ref from https://gitlab.com/-/snippets/1948157
 # For some variants, look here https://en.wikibooks.org/wiki/Algorithm_Implementation/Strings/Levenshtein_distance#Python
 